@@ -0,0 +1,215 @@
+import hashlib
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+def linear_assignment(costs: np.ndarray, return_duals: bool = False) -> Tuple:
+    """Solves linear assignment problem with shortest augmenting path (Hungarian / Jonker-Volgenant) method.
+    Each augmentation is O(n^2), inner loops over columns are vectorized.
+
+    Args:
+        costs: (n, n) matrix, costs[i, j] is cost of assigning row i to column j
+        return_duals: (optional) additionally return dual potentials of rows and columns,
+            costs - row_duals[:, None] - column_duals[None, :] are non-negative reduced costs
+
+    Returns:
+        assignment (column of each row) and its total cost (and duals if requested)
+    """
+    costs = np.asarray(costs, dtype=np.float64)
+    n = costs.shape[0]
+    if n == 0:
+        empty = np.empty(0, dtype=np.intp), 0.0
+        return empty + (np.zeros(0), np.zeros(0)) if return_duals else empty
+    # index 0 is artificial column, rows and columns of `costs` are 1-indexed below
+    u = np.zeros(n + 1)
+    v = np.zeros(n + 1)
+    row_of = np.zeros(n + 1, dtype=np.intp)  # row assigned to column, 0 if column is free
+    way = np.zeros(n + 1, dtype=np.intp)
+    for row in range(1, n + 1):
+        row_of[0] = row
+        column = 0
+        min_reduced = np.full(n + 1, np.inf)
+        used = np.zeros(n + 1, dtype=bool)
+        while True:
+            used[column] = True
+            current_row = row_of[column]
+            free = ~used
+            free[0] = False
+            reduced = costs[current_row - 1] - u[current_row] - v[1:]
+            improved = free[1:] & (reduced < min_reduced[1:])
+            min_reduced[1:][improved] = reduced[improved]
+            way[1:][improved] = column
+            candidates = np.flatnonzero(free)
+            next_column = candidates[np.argmin(min_reduced[candidates])]
+            delta = min_reduced[next_column]
+            u[row_of[used]] += delta
+            v[used] -= delta
+            min_reduced[free] -= delta
+            column = next_column
+            if row_of[column] == 0:
+                break
+        while column:  # augment along alternating path
+            previous = way[column]
+            row_of[column] = row_of[previous]
+            column = previous
+
+    assignment = np.empty(n, dtype=np.intp)
+    assignment[row_of[1:] - 1] = np.arange(n)
+    total = float(costs[np.arange(n), assignment].sum())
+    if return_duals:
+        return assignment, total, u[1:], v[1:]
+    return assignment, total
+
+
+def min_scalar_products(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Minimal scalar product of every row of `a` with every row of `b` over all orderings of elements.
+    Achieved by pairing ascending elements of one vector with descending elements of the other.
+    """
+    return np.sort(a, axis=1) @ np.sort(b, axis=1)[:, ::-1].T
+
+
+def gilmore_lawler_matrix(dist: np.ndarray, costs: np.ndarray) -> np.ndarray:
+    """Matrix of Gilmore-Lawler bound, entry [i, k] bounds contribution of facility i placed at location k.
+
+    Args:
+        dist: matrix that represents distances between places
+        costs: matrix that represents cost per unit of distance for facilities
+
+    Returns:
+        (n, n) matrix for linear assignment
+    """
+    # objective is sum_ij costs[i, j] * dist.T[p[i], p[j]]
+    flows = np.asarray(costs, dtype=np.float64)
+    distances = np.asarray(dist, dtype=np.float64).T
+    n = flows.shape[0]
+    off_diagonal = ~np.eye(n, dtype=bool)
+    flows_off = flows[off_diagonal].reshape(n, n - 1)
+    distances_off = distances[off_diagonal].reshape(n, n - 1)
+    return np.outer(np.diag(flows), np.diag(distances)) + min_scalar_products(flows_off, distances_off)
+
+
+def partial_gilmore_lawler_matrix(flows: np.ndarray,
+                                  distances: np.ndarray,
+                                  facilities: np.ndarray,
+                                  locations: np.ndarray) -> Tuple[float, np.ndarray, np.ndarray, np.ndarray]:
+    """Gilmore-Lawler bound of partial assignment in Koopmans-Beckmann form
+    `sum_ij flows[i, j] * distances[p[i], p[j]]` (`flows = costs` and `distances = dist.T` for `objective`).
+    Interactions of free facilities with assigned ones are known exactly for every candidate location,
+    interactions between free facilities are bounded by minimal scalar products.
+
+    Args:
+        flows: float (n, n) flow matrix
+        distances: float (n, n) distance matrix
+        facilities: assigned facilities
+        locations: locations of assigned facilities
+
+    Returns:
+        cost of assigned part, matrix for linear assignment of free facilities (rows) to free locations (columns),
+        free facilities and free locations
+    """
+    n = flows.shape[0]
+    free_facilities = np.setdiff1d(np.arange(n), facilities)
+    free_locations = np.setdiff1d(np.arange(n), locations)
+    fixed = float(np.sum(flows[np.ix_(facilities, facilities)] * distances[np.ix_(locations, locations)]))
+    m = free_facilities.shape[0]
+    if m == 0:
+        return fixed, np.zeros((0, 0)), free_facilities, free_locations
+
+    free_flows = flows[np.ix_(free_facilities, free_facilities)]
+    free_distances = distances[np.ix_(free_locations, free_locations)]
+    # interactions with assigned facilities in both directions
+    matrix = (flows[np.ix_(free_facilities, facilities)] @ distances[np.ix_(free_locations, locations)].T +
+              flows[np.ix_(facilities, free_facilities)].T @ distances[np.ix_(locations, free_locations)])
+    matrix += np.outer(np.diag(free_flows), np.diag(free_distances))
+    if m > 1:
+        off_diagonal = ~np.eye(m, dtype=bool)
+        matrix += min_scalar_products(free_flows[off_diagonal].reshape(m, m - 1),
+                                      free_distances[off_diagonal].reshape(m, m - 1))
+    return fixed, matrix, free_facilities, free_locations
+
+
+def gilmore_lawler_bound(dist: np.ndarray, costs: np.ndarray) -> float:
+    """Gilmore-Lawler lower bound of `objective`, O(n^3).
+
+    Args:
+        dist: matrix that represents distances between places
+        costs: matrix that represents cost per unit of distance for facilities
+
+    Returns:
+        lower bound of objective over all permutations
+    """
+    _, bound = linear_assignment(gilmore_lawler_matrix(dist, costs))
+    return bound
+
+
+def eigenvalue_bound(dist: np.ndarray, costs: np.ndarray) -> Optional[float]:
+    """Eigenvalue lower bound of `objective` (Finke, Burkard and Rendl), minimal scalar product of spectra.
+    Asymmetric matrix is replaced by its symmetric part, which doesn't change objective when the other
+    matrix is symmetric, so the bound is available only if at least one of matrices is symmetric.
+
+    Args:
+        dist: matrix that represents distances between places
+        costs: matrix that represents cost per unit of distance for facilities
+
+    Returns:
+        lower bound of objective or None if both matrices are asymmetric
+    """
+    flows = np.asarray(costs, dtype=np.float64)
+    distances = np.asarray(dist, dtype=np.float64)
+    if not (np.array_equal(flows, flows.T) or np.array_equal(distances, distances.T)):
+        return None
+    flows_spectrum = np.linalg.eigvalsh((flows + flows.T) / 2)
+    distances_spectrum = np.linalg.eigvalsh((distances + distances.T) / 2)
+    # eigvalsh returns ascending eigenvalues
+    return float(flows_spectrum @ distances_spectrum[::-1])
+
+
+BOUNDS = {
+    'gilmore_lawler': gilmore_lawler_bound,
+    'eigenvalue': eigenvalue_bound,
+}
+
+_CACHE_SIZE = 64
+_bounds_cache: 'OrderedDict[Tuple[str, str], Optional[float]]' = OrderedDict()
+
+
+def lower_bound(dist: np.ndarray, costs: np.ndarray, method: str = 'gilmore_lawler') -> Optional[float]:
+    """Lower bound of `objective` cached per instance (keyed by content of matrices).
+
+    Args:
+        dist: matrix that represents distances between places
+        costs: matrix that represents cost per unit of distance for facilities
+        method: (optional) 'gilmore_lawler' or 'eigenvalue' (cheaper, but usually weaker)
+
+    Returns:
+        lower bound (integer instances get bound rounded up) or None if method is not applicable
+    """
+    if method not in BOUNDS:
+        raise ValueError(f'unknown bound {method}, available: {list(BOUNDS)}')
+    digest = hashlib.blake2b(digest_size=16)
+    for matrix in (dist, costs):
+        matrix = np.ascontiguousarray(matrix)
+        digest.update(f'{matrix.dtype}{matrix.shape}'.encode())
+        digest.update(matrix.tobytes())
+    key = (method, digest.hexdigest())
+    if key in _bounds_cache:
+        _bounds_cache.move_to_end(key)
+        return _bounds_cache[key]
+
+    bound = BOUNDS[method](dist, costs)
+    if bound is not None and np.issubdtype(np.result_type(dist, costs), np.integer):
+        # objective of integer instance is integer, tolerance guards against rounding of float computations
+        bound = float(np.ceil(bound - 1e-6 * max(1.0, abs(bound))))
+    _bounds_cache[key] = bound
+    if len(_bounds_cache) > _CACHE_SIZE:
+        _bounds_cache.popitem(last=False)
+    return bound
+
+
+def gap(cost: float, bound: float) -> float:
+    """Proven gap of solution in percents relative to lower bound."""
+    if bound <= 0:
+        return np.inf if cost > bound else 0.0
+    return (cost - bound) / bound * 100
@@ -0,0 +1,267 @@
+import os
+from functools import cached_property, partial
+from typing import Callable, Dict, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+from QAP import objective as kernels
+from QAP import bounds
+from QAP.utils.data_utils import load_instance, smallest_int_dtype
+
+
+class Evaluation(NamedTuple):
+    """Evaluation functions of an instance bound to objective of a solver (see `QAPInstance.bind`).
+    Incremental functions are None if objective can't be updated incrementally.
+    """
+    objective: Callable[[np.ndarray], int]
+    batch_objective: Callable[[np.ndarray], np.ndarray]
+    delta: Optional[Callable[[np.ndarray, int, int], int]] = None
+    row_deltas: Optional[Callable[[np.ndarray, int], np.ndarray]] = None
+    batch_delta: Optional[Callable[[np.ndarray, np.ndarray, np.ndarray], np.ndarray]] = None
+    reevaluate: Optional[Callable[[np.ndarray, np.ndarray, np.ndarray], Tuple[np.ndarray, np.ndarray]]] = None
+
+
+class QAPInstance:
+    """QAP instance that owns its matrices and derived data.
+    Matrices are stored contiguous and read-only in a narrow dtype (that's what is pickled or placed in shared
+    memory for worker processes), while all evaluations accumulate in int64 (float64 for float matrices),
+    so narrow storage never overflows. Derived data (matrices in accumulation dtype, transposes, structure,
+    row and column sums, specialized kernels and lower bounds) is computed lazily once per instance
+    and is not pickled.
+    Args:
+        dist: matrix that represents distances between places
+        costs: matrix that represents cost per unit of distance for facilities
+        dtype: (optional) storage dtype, the smallest integer dtype that holds all values by default
+            (float64 for float matrices)
+        name: (optional) name of instance, e.g. name of QAPLib problem
+    """
+    def __init__(self,
+                 dist: np.ndarray,
+                 costs: np.ndarray,
+                 dtype: Optional[Union[str, np.dtype]] = None,
+                 name: Optional[str] = None):
+        dist, costs = np.asarray(dist), np.asarray(costs)
+        if dist.ndim != 2 or dist.shape[0] != dist.shape[1] or dist.shape != costs.shape:
+            raise ValueError(f'matrices should be square and of the same shape, got {dist.shape} and {costs.shape}')
+        integer = np.issubdtype(dist.dtype, np.integer) and np.issubdtype(costs.dtype, np.integer)
+        if dtype is None:
+            dtype = smallest_int_dtype(np.stack([dist, costs])) if integer else np.float64
+        self.dtype = np.dtype(dtype)
+        lossless = all(np.array_equal(matrix.astype(self.dtype), matrix) for matrix in (dist, costs))
+        if integer != np.issubdtype(self.dtype, np.integer) or not lossless:
+            raise ValueError(f'matrices can not be stored in {self.dtype} without loss')
+        self.accumulator = np.dtype(np.int64 if integer else np.float64)
+        self.dist = self._read_only(dist)
+        self.costs = self._read_only(costs)
+        self.n = self.dist.shape[0]
+        self.name = name
+        self._bounds: Dict[str, Optional[float]] = {}
+
+    def _read_only(self, matrix: np.ndarray) -> np.ndarray:
+        # view, so flags of caller's array stay untouched when no copy is needed
+        matrix = np.ascontiguousarray(matrix, dtype=self.dtype).view()
+        matrix.flags.writeable = False
+        return matrix
+
+    @classmethod
+    def load(cls,
+             file_path: str,
+             solution_path: Optional[str] = None,
+             dtype: Optional[Union[str, np.dtype]] = None,
+             **kwargs) -> 'QAPInstance':
+        """Reads instance from .dat file with `load_instance` (matrices order is detected with .sln file if given).
+        Args:
+            file_path: path to .dat file
+            solution_path: (optional) path to .sln file
+            dtype: (optional) storage dtype
+            kwargs: (optional) `check_prefix`, `cache` and `cache_dir` of `load_instance`
+        Returns:
+            instance named after the file
+        """
+        # cached matrices are memory-mapped in storage dtype, so instance keeps views of the maps without copies
+        _, dist, costs = load_instance(file_path, solution_path, memory_map=True, **kwargs)
+        return cls(dist, costs, dtype, os.path.splitext(os.path.basename(file_path))[0])
+
+    def __reduce__(self):
+        # only matrices in storage dtype are sent to other processes, derived data is computed there when needed
+        return self.__class__, (self.dist, self.costs, self.dtype, self.name)
+
+    def __repr__(self):
+        name = '' if self.name is None else f'{self.name}, '
+        return f'{self.__class__.__name__}({name}n={self.n}, dtype={self.dtype})'
+
+    # derived data
+    @cached_property
+    def wide_dist(self) -> np.ndarray:
+        """Distance matrix in accumulation dtype."""
+        return self.dist.astype(self.accumulator)
+
+    @cached_property
+    def wide_costs(self) -> np.ndarray:
+        """Cost matrix in accumulation dtype."""
+        return self.costs.astype(self.accumulator)
+
+    @cached_property
+    def dist_t(self) -> np.ndarray:
+        """Contiguous transpose of distance matrix in accumulation dtype."""
+        return np.ascontiguousarray(self.wide_dist.T)
+
+    @cached_property
+    def costs_t(self) -> np.ndarray:
+        """Contiguous transpose of cost matrix in accumulation dtype."""
+        return np.ascontiguousarray(self.wide_costs.T)
+
+    @cached_property
+    def structure(self) -> kernels.InstanceStructure:
+        return kernels.instance_structure(self.dist, self.costs)
+
+    @property
+    def symmetric(self) -> bool:
+        return self.structure.symmetric
+
+    @property
+    def sparse(self) -> bool:
+        return self.structure.sparse
+
+    @cached_property
+    def dist_row_sums(self) -> np.ndarray:
+        return self.wide_dist.sum(axis=1)
+
+    @cached_property
+    def dist_column_sums(self) -> np.ndarray:
+        return self.wide_dist.sum(axis=0)
+
+    @cached_property
+    def costs_row_sums(self) -> np.ndarray:
+        return self.wide_costs.sum(axis=1)
+
+    @cached_property
+    def costs_column_sums(self) -> np.ndarray:
+        return self.wide_costs.sum(axis=0)
+
+    @cached_property
+    def structured(self) -> Optional[kernels.StructuredObjective]:
+        """Kernels specialized for symmetric and sparse instances, None if dense kernels should be used."""
+        if self.structure.symmetric or self.structure.sparse:
+            return kernels.StructuredObjective(self.wide_dist, self.wide_costs, self.structure)
+        return None
+
+    @cached_property
+    def evaluation_work(self) -> int:
+        """Number of terms gathered by `batch_objective` per permutation."""
+        if self.structured is not None:
+            weights = self.structured.flow_list[2]
+            if weights.shape[0] <= kernels.SPARSE_DENSITY * self.n ** 2:
+                return weights.shape[0]
+        return self.n ** 2
+
+    def lower_bound(self, method: str = 'gilmore_lawler') -> Optional[float]:
+        """Lower bound of objective (see `QAP.bounds.lower_bound`), computed once per method."""
+        if method not in self._bounds:
+            self._bounds[method] = bounds.lower_bound(self.wide_dist, self.wide_costs, method)
+        return self._bounds[method]
+
+    # evaluation
+    def objective(self, permutation: np.ndarray) -> int:
+        """Objective value of permutation (see `QAP.objective.objective`)."""
+        if self.structured is not None:
+            return self.structured.objective(permutation)
+        return np.sum(self.costs_t * self.wide_dist[np.ix_(permutation, permutation)])
+
+    def batch_objective(self, permutations: np.ndarray) -> np.ndarray:
+        """Objective values of (m, n) array of permutations."""
+        if self.structured is not None:
+            return self.structured.batch_objective(permutations)
+        return kernels.batch_objective(self.wide_dist, self.wide_costs, permutations)
+
+    def swap_delta(self, permutation: np.ndarray, i: int, j: int) -> int:
+        """Change of objective after swapping positions i and j of permutation."""
+        if self.structured is not None:
+            return self.structured.swap_delta(permutation, i, j)
+        return kernels.swap_delta(self.wide_dist, self.wide_costs, permutation, i, j)
+
+    def batch_swap_delta(self, permutations: np.ndarray, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+        """Changes of objective of m permutations, each with its own pair of swapped positions."""
+        if self.structured is not None:
+            return self.structured.batch_swap_delta(permutations, i, j)
+        return kernels.batch_swap_delta(self.wide_dist, self.wide_costs, permutations, i, j)
+
+    def swap_deltas(self, permutation: np.ndarray, i: int) -> np.ndarray:
+        """Changes of objective after swapping position i with every other position."""
+        return kernels.swap_deltas(self.wide_dist, self.wide_costs, permutation, i)
+
+    def batch_changed_delta(self, parents: np.ndarray, permutations: np.ndarray,
+                            changed: Optional[np.ndarray] = None) -> np.ndarray:
+        """Changes of objective between parents and permutations, O(n * k) for k changed positions."""
+        return kernels.batch_changed_delta(self.wide_dist, self.wide_costs, parents, permutations, changed)
+
+    def reevaluate(self,
+                   parents: np.ndarray,
+                   parent_costs: np.ndarray,
+                   permutations: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Costs of permutations derived from parents with known costs (e.g. mutated or bred from them).
+        Permutation is updated incrementally from its parent when it differs in few positions
+        (cheaper than full evaluation according to `evaluation_work`), others are evaluated from scratch.
+        Args:
+            parents: (m, n) array of parents
+            parent_costs: vector of m costs of parents
+            permutations: (m, n) array of derived permutations
+        Returns:
+            vector of m costs and boolean mask of incrementally evaluated permutations
+        """
+        parent_costs = np.asarray(parent_costs)
+        changed = parents != permutations
+        incremental = changed.sum(axis=1) * self.n * kernels.CHANGED_TERM_COST < self.evaluation_work
+        costs = np.empty(permutations.shape[0], dtype=self.accumulator)
+        if np.any(incremental):
+            costs[incremental] = parent_costs[incremental] + self.batch_changed_delta(
+                parents[incremental], permutations[incremental], changed[incremental])
+        if not np.all(incremental):
+            costs[~incremental] = self.batch_objective(permutations[~incremental])
+        return costs, incremental
+
+    def delta_matrix(self, permutation: np.ndarray, cost: Optional[int] = None) -> kernels.SwapDeltaMatrix:
+        """Taillard-style `SwapDeltaMatrix` of permutation."""
+        return kernels.SwapDeltaMatrix(self.wide_dist, self.wide_costs, permutation, cost)
+
+    def bind(self,
+             objective_fn: Callable[[np.ndarray, np.ndarray, np.ndarray], int] = kernels.objective) -> Evaluation:
+        """Evaluation functions of objective passed to solver.
+        Args:
+            objective_fn: (optional) objective function that accepts dist, cost and permutation,
+                incremental evaluation is available only for the standard QAP objective
+        Returns:
+            `Evaluation` with methods of this instance for the standard objective,
+            objective_fn bound to matrices (in accumulation dtype) otherwise
+        """
+        if objective_fn is kernels.objective:
+            return Evaluation(self.objective, self.batch_objective, self.swap_delta, self.swap_deltas,
+                              self.batch_swap_delta, self.reevaluate)
+        dist, costs = self.wide_dist, self.wide_costs
+
+        def evaluate(permutations: np.ndarray) -> np.ndarray:
+            return np.array([objective_fn(dist, costs, p) for p in permutations])
+        return Evaluation(partial(objective_fn, dist, costs), evaluate)
+
+
+def as_instance(n: Union[int, QAPInstance],
+                dist: Optional[np.ndarray] = None,
+                cost: Optional[np.ndarray] = None) -> QAPInstance:
+    """Solvers accept `QAPInstance` or size of a problem with both matrices, this returns instance in both cases.
+    Args:
+        n: size of a problem or instance
+        dist: (optional) 2d distance matrix, omitted when instance is given
+        cost: (optional) 2d cost matrix, omitted when instance is given
+    Returns:
+        given instance or new instance that owns copies of matrices
+    """
+    if isinstance(n, QAPInstance):
+        if dist is not None or cost is not None:
+            raise ValueError('matrices should not be passed together with QAPInstance')
+        return n
+    if dist is None or cost is None:
+        raise ValueError('both dist and cost matrices are required when size of a problem is given')
+    instance = QAPInstance(dist, cost)
+    if instance.n != n:
+        raise ValueError(f'size of a problem {n} does not match matrices of size {instance.n}')
+    return instance
@@ -1,4 +1,45 @@
 import numpy as np
+from functools import cached_property
+from typing import List, NamedTuple, Optional, Tuple
+
+# matrix with at most this fraction of nonzero entries is treated as sparse
+SPARSE_DENSITY = 0.25
+# mean number of stored entries per row up to which swap deltas loop over CSR rows
+SPARSE_ROW_LENGTH = 8
+# cost of one term of `batch_changed_delta` relative to one gathered term of full evaluation
+CHANGED_TERM_COST = 6
+
+
+class InstanceStructure(NamedTuple):
+    """Structural properties of instance that allow cheaper evaluation (see `instance_structure`)."""
+    dist_symmetric: bool
+    costs_symmetric: bool
+    dist_density: float
+    costs_density: float
+
+    @property
+    def symmetric(self) -> bool:
+        """Pairs (i, j) and (j, i) can be accumulated together if at least one matrix is symmetric."""
+        return self.dist_symmetric or self.costs_symmetric
+
+    @property
+    def sparse(self) -> bool:
+        return min(self.dist_density, self.costs_density) <= SPARSE_DENSITY
+
+
+def instance_structure(dist: np.ndarray, costs: np.ndarray) -> InstanceStructure:
+    """Detects symmetry and density of matrices in O(n^2).
+
+    Args:
+        dist: matrix that represents distances between places
+        costs: matrix that represents cost per unit of distance for facilities
+
+    Returns:
+        `InstanceStructure` of the instance
+    """
+    size = max(1, dist.size)
+    return InstanceStructure(bool(np.array_equal(dist, dist.T)), bool(np.array_equal(costs, costs.T)),
+                             np.count_nonzero(dist) / size, np.count_nonzero(costs) / size)
 
 
 def naive_objective(dist: np.ndarray, costs: np.ndarray,
@@ -35,6 +76,368 @@ def objective(dist: np.ndarray, costs: np.ndarray,
     Returns:
         Objective value for given permutation
     """
-    P = np.zeros_like(dist)
-    P[np.arange(dist.shape[0]), permutation] = 1  # create permutation matrix
-    return np.sum(np.diagonal(costs @ P @ dist @ P.T))
+    # equivalent to trace(costs @ P @ dist @ P.T) for permutation matrix P, but O(n^2)
+    return np.sum(costs.T * dist[np.ix_(permutation, permutation)])
+
+
+def batch_objective(dist: np.ndarray, costs: np.ndarray,
+                    permutations: np.ndarray,
+                    max_chunk_elements: int = 2 ** 22) -> np.ndarray:
+    """Vectorized objective calculation for many permutations at once.
+
+    Args:
+        dist: matrix that represents distances between places
+        costs: matrix that represents cost per unit of distance for facilities
+        permutations: (m, n) array of permutations
+        max_chunk_elements: (optional) upper bound of gathered elements kept in memory at once
+
+    Returns:
+        vector of m objective values
+    """
+    m, n = permutations.shape
+    chunk_size = max(1, max_chunk_elements // max(1, n * n))
+    costs_t = costs.T
+    res = np.empty(m, dtype=np.result_type(dist, costs))
+    for start in range(0, m, chunk_size):
+        chunk = permutations[start:start + chunk_size]
+        gathered = dist[chunk[:, :, None], chunk[:, None, :]]
+        res[start:start + chunk_size] = np.einsum('ij,mij->m', costs_t, gathered)
+    return res
+
+
+def swap_delta(dist: np.ndarray, costs: np.ndarray,
+               permutation: np.ndarray, i: int, j: int) -> int:
+    """O(n) change of `objective` after swapping positions i and j of permutation.
+
+    Args:
+        dist: matrix that represents distances between places
+        costs: matrix that represents cost per unit of distance for facilities
+        permutation: permutation that represents current solution (not modified)
+        i: first swapped position
+        j: second swapped position
+
+    Returns:
+        objective(swapped permutation) - objective(permutation)
+    """
+    if i == j:
+        return 0
+    pi, pj = permutation[i], permutation[j]
+    # terms for pairs that contain exactly one of i, j
+    terms = ((costs[:, i] - costs[:, j]) * (dist[pj, permutation] - dist[pi, permutation]) +
+             (costs[i] - costs[j]) * (dist[permutation, pj] - dist[permutation, pi]))
+    res = terms.sum() - terms[i] - terms[j]
+    # terms for pairs (i, i), (i, j), (j, i) and (j, j)
+    res += ((costs[i, i] - costs[j, j]) * (dist[pj, pj] - dist[pi, pi]) +
+            (costs[i, j] - costs[j, i]) * (dist[pi, pj] - dist[pj, pi]))
+    return res
+
+
+def batch_swap_delta(dist: np.ndarray, costs: np.ndarray,
+                     permutations: np.ndarray, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+    """O(m*n) vectorized `swap_delta` for m permutations, each with its own pair of swapped positions.
+
+    Args:
+        dist: matrix that represents distances between places
+        costs: matrix that represents cost per unit of distance for facilities
+        permutations: (m, n) array of permutations (not modified)
+        i: vector of m first swapped positions
+        j: vector of m second swapped positions (i != j)
+
+    Returns:
+        vector of m deltas
+    """
+    rows = np.arange(permutations.shape[0])
+    pi, pj = permutations[rows, i], permutations[rows, j]
+    terms = ((costs[:, i] - costs[:, j]).T * (dist[pj[:, None], permutations] - dist[pi[:, None], permutations]) +
+             (costs[i] - costs[j]) * (dist[permutations, pj[:, None]] - dist[permutations, pi[:, None]]))
+    res = terms.sum(axis=1) - terms[rows, i] - terms[rows, j]
+    res += ((costs[i, i] - costs[j, j]) * (dist[pj, pj] - dist[pi, pi]) +
+            (costs[i, j] - costs[j, i]) * (dist[pi, pj] - dist[pj, pi]))
+    return res
+
+
+def swap_deltas(dist: np.ndarray, costs: np.ndarray,
+                permutation: np.ndarray, i: int) -> np.ndarray:
+    """O(n^2) changes of `objective` after swapping position i with every other position.
+
+    Args:
+        dist: matrix that represents distances between places
+        costs: matrix that represents cost per unit of distance for facilities
+        permutation: permutation that represents current solution (not modified)
+        i: position to swap
+
+    Returns:
+        vector of deltas, where j-th element corresponds to swap of positions i and j
+    """
+    pi = permutation[i]
+    permuted_dist = dist[np.ix_(permutation, permutation)]  # permuted_dist[a, b] = dist[p[a], p[b]]
+    permuted_diag = np.diagonal(permuted_dist)
+    costs_diag = np.diagonal(costs)
+
+    # sum over all k of terms for pairs (k, i), (k, j), (i, k), (j, k)
+    res = (((costs[:, i, None] - costs).T * (permuted_dist - permuted_dist[i])).sum(axis=1) +
+           ((costs[i] - costs) * (permuted_dist - permuted_dist[:, i, None]).T).sum(axis=1))
+    # remove k == i and k == j, they are accounted below
+    res -= ((costs[i, i] - costs[i]) * (permuted_dist[:, i] - permuted_diag[i]) +
+            (costs[i, i] - costs[:, i]) * (permuted_dist[i] - permuted_diag[i]) +
+            (costs[:, i] - costs_diag) * (permuted_diag - permuted_dist[i]) +
+            (costs[i] - costs_diag) * (permuted_diag - permuted_dist[:, i]))
+    # terms for pairs (i, i), (i, j), (j, i) and (j, j)
+    res += ((costs[i, i] - costs_diag) * (permuted_diag - permuted_diag[i]) +
+            (costs[i] - costs[:, i]) * (dist[pi, permutation] - dist[permutation, pi]))
+    res[i] = 0
+    return res
+
+
+def batch_changed_delta(dist: np.ndarray, costs: np.ndarray,
+                        parents: np.ndarray, permutations: np.ndarray,
+                        changed: Optional[np.ndarray] = None) -> np.ndarray:
+    """O(n*k) changes of `objective` between parents and permutations that differ in k positions.
+    Only terms of rows and columns of changed positions differ, pairs of two changed positions are
+    accumulated in rows only.
+
+    Args:
+        dist: matrix that represents distances between places
+        costs: matrix that represents cost per unit of distance for facilities
+        parents: (m, n) array of permutations with known cost
+        permutations: (m, n) array of derived permutations
+        changed: (optional) (m, n) boolean mask of positions where permutations differ from parents
+            (or superset of them), computed if not given
+
+    Returns:
+        vector of m deltas
+    """
+    if changed is None:
+        changed = parents != permutations
+    rows, positions = np.nonzero(changed)
+    p, q = parents[rows], permutations[rows]
+    ps, qs = p[np.arange(rows.shape[0]), positions], q[np.arange(rows.shape[0]), positions]
+    # row terms costs[s, j] * dist[p[j], p[s]] and column terms costs[i, s] * dist[p[s], p[i]]
+    terms = costs[positions] * (dist[q, qs[:, None]] - dist[p, ps[:, None]])
+    column_terms = costs[:, positions].T * (dist[qs[:, None], q] - dist[ps[:, None], p])
+    column_terms[changed[rows]] = 0
+    terms += column_terms
+    res = np.zeros(parents.shape[0], dtype=terms.dtype)
+    np.add.at(res, rows, terms.sum(axis=1))
+    return res
+
+
+class SwapDeltaMatrix:
+    """Taillard-style matrix of objective changes for all pairwise swaps of a permutation.
+
+    Construction costs O(n^3), after each accepted swap all deltas are updated in O(n^2).
+
+    Args:
+        dist: matrix that represents distances between places
+        costs: matrix that represents cost per unit of distance for facilities
+        permutation: permutation that represents current solution (copied)
+        cost: (optional) objective value of permutation if it is already known
+    """
+    def __init__(self, dist: np.ndarray, costs: np.ndarray,
+                 permutation: np.ndarray, cost: int = None):
+        self.dist = dist
+        self.costs = costs
+        self.permutation = permutation.copy()
+        self.cost = objective(dist, costs, self.permutation) if cost is None else cost
+        self.deltas = np.stack([
+            swap_deltas(dist, costs, self.permutation, i)
+            for i in range(self.permutation.shape[0])
+        ])
+
+    def swap(self, r: int, s: int) -> int:
+        """Applies swap of positions r and s and updates deltas of all other swaps.
+
+        Args:
+            r: first swapped position
+            s: second swapped position
+
+        Returns:
+            objective value after the swap
+        """
+        if r == s:
+            return self.cost
+        dist, costs, p = self.dist, self.costs, self.permutation
+        self.cost += self.deltas[r, s]
+        p[[r, s]] = p[[s, r]]
+
+        # O(1) update for every pair disjoint with {r, s} (see Taillard, 1991)
+        x = costs[r] - costs[s]
+        y = dist[p, p[s]] - dist[p, p[r]]
+        z = costs[:, r] - costs[:, s]
+        w = dist[p[s], p] - dist[p[r], p]
+        self.deltas += ((x[:, None] - x[None, :]) * (y[:, None] - y[None, :]) +
+                        (z[:, None] - z[None, :]) * (w[:, None] - w[None, :]))
+
+        # pairs that contain r or s have to be recalculated
+        for k in (r, s):
+            row = swap_deltas(dist, costs, p, k)
+            self.deltas[k] = row
+            self.deltas[:, k] = row
+        return self.cost
+
+
+class StructuredObjective:
+    """`objective` and swap deltas specialized for symmetric and sparse instances, results are exact.
+
+    Objective is written as flow list `sum_xy a[x, y] * b[s[x], s[y]]` over nonzero entries of `a`,
+    where (a, b, s) is (costs, dist.T, permutation) or, when dist is the sparser matrix of a sparse instance,
+    (dist.T, costs, inverse permutation). If any matrix is symmetric, pairs (x, y) and (y, x) are folded into
+    one entry of the list, so only half of the matrix is visited.
+    Swap delta of a sparse instance visits only stored entries of two CSR rows of `a`,
+    symmetric dense instances use the symmetric delta formula with half of the work of `swap_delta`.
+
+    Args:
+        dist: matrix that represents distances between places
+        costs: matrix that represents cost per unit of distance for facilities
+        structure: (optional) `instance_structure` of matrices if it is already known
+    """
+    def __init__(self, dist: np.ndarray, costs: np.ndarray, structure: InstanceStructure = None):
+        self.dist = dist
+        self.costs = costs
+        self.n = dist.shape[0]
+        self.structure = instance_structure(dist, costs) if structure is None else structure
+        self.inverse = self.structure.sparse and self.structure.dist_density < self.structure.costs_density
+        self.a, self.b = (dist.T, costs) if self.inverse else (costs, dist.T)
+        self.a_diag = np.diagonal(self.a).copy()
+        self.b_diag = np.diagonal(self.b).copy()
+
+    @cached_property
+    def sides(self) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Pairs (A, B) such that delta of swap of x and y is sum over sides of
+        `sum_{k != x, y} (A[x, k] - A[y, k]) * (B[s[y], s[k]] - B[s[x], s[k]])` plus `_corners`.
+        Symmetric instance has one folded side, asymmetric one side per direction of pairs.
+        """
+        a, b = self.a, self.b
+        if not self.structure.symmetric:
+            return [(np.ascontiguousarray(a.T), np.ascontiguousarray(b.T)), (a, np.ascontiguousarray(b))]
+        if np.array_equal(b, b.T):
+            folded_a, folded_b = a + a.T, b
+        else:
+            folded_a, folded_b = a.copy(), b + b.T - np.diag(self.b_diag)
+        # diagonal is accounted separately (flow list and `_corners`)
+        np.fill_diagonal(folded_a, 0)
+        return [(folded_a, np.ascontiguousarray(folded_b))]
+
+    @cached_property
+    def flow_list(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Rows, columns and weights of stored entries of `a` and flattened matrix they are paired with."""
+        if not self.structure.symmetric:
+            rows, columns = np.nonzero(self.a)
+            return rows, columns, self.a[rows, columns], np.ascontiguousarray(self.b).ravel()
+        folded_a, folded_b = self.sides[0]
+        rows, columns = np.nonzero(np.triu(folded_a, 1))
+        diagonal = np.flatnonzero(self.a_diag)
+        return (np.concatenate([rows, diagonal]), np.concatenate([columns, diagonal]),
+                np.concatenate([folded_a[rows, columns], self.a_diag[diagonal]]), folded_b.ravel())
+
+    @cached_property
+    def sparse_rows(self) -> bool:
+        """Weather swap deltas should visit only stored entries of rows."""
+        stored = sum(np.count_nonzero(side_a) for side_a, _ in self.sides)
+        return self.structure.sparse and stored <= SPARSE_ROW_LENGTH * self.n * len(self.sides)
+
+    @cached_property
+    def csr_rows(self) -> List[Tuple[List[List[int]], List[List[int]], List[List[int]]]]:
+        """For every side column indices and values of nonzero entries of each row of A (as python lists,
+        rows are short) and B as nested lists."""
+        res = []
+        for side_a, side_b in self.sides:
+            columns = [np.flatnonzero(row) for row in side_a]
+            res.append(([c.tolist() for c in columns], [row[c].tolist() for row, c in zip(side_a, columns)],
+                        side_b.tolist()))
+        return res
+
+    @cached_property
+    def ell_rows(self) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """For every side CSR rows of A padded to equal length (ELLPACK), padding entries have zero weight."""
+        res = []
+        for side_a, _ in self.sides:
+            length = max(1, int(np.count_nonzero(side_a, axis=1).max()))
+            # stable sort moves nonzero entries of each row to the front
+            columns = np.argsort(side_a == 0, axis=1, kind='stable')[:, :length]
+            res.append((columns, np.take_along_axis(side_a, columns, axis=1)))
+        return res
+
+    def _arguments(self, permutation: np.ndarray, i, j):
+        """Permutation of flow list and swapped elements of it."""
+        if not self.inverse:
+            return permutation, i, j
+        inverse = np.empty_like(permutation)
+        inverse[permutation] = np.arange(self.n)
+        return inverse, permutation[i], permutation[j]
+
+    def _batch_arguments(self, permutations: np.ndarray, i: np.ndarray, j: np.ndarray):
+        if not self.inverse:
+            return permutations, i, j
+        rows = np.arange(permutations.shape[0])
+        inverse = np.empty_like(permutations)
+        inverse[rows[:, None], permutations] = np.arange(self.n)
+        return inverse, permutations[rows, i], permutations[rows, j]
+
+    def _corners(self, x, y, sx, sy):
+        """Changes of diagonal terms and of pair (x, y) itself (the latter is zero for symmetric instances)."""
+        a, b = self.a, self.b
+        return ((self.a_diag[x] - self.a_diag[y]) * (self.b_diag[sy] - self.b_diag[sx]) +
+                (a[x, y] - a[y, x]) * (b[sy, sx] - b[sx, sy]))
+
+    def objective(self, permutation: np.ndarray) -> int:
+        """`objective` of permutation, O(number of stored entries)."""
+        s = self._arguments(permutation, 0, 0)[0]
+        rows, columns, weights, flat_b = self.flow_list
+        return weights @ flat_b.take(s[rows] * self.n + s[columns])
+
+    def batch_objective(self, permutations: np.ndarray, max_chunk_elements: int = 2 ** 22) -> np.ndarray:
+        """`batch_objective` of (m, n) array of permutations, flow list is used only if it is short,
+        since gathering of whole permuted matrix is cheaper per element than gathering of a list."""
+        rows, columns, weights, flat_b = self.flow_list
+        if weights.shape[0] > SPARSE_DENSITY * self.n ** 2:
+            return batch_objective(self.dist, self.costs, permutations, max_chunk_elements)
+        s = self._batch_arguments(permutations, 0, 0)[0]
+        chunk_size = max(1, max_chunk_elements // max(1, weights.shape[0]))
+        res = np.empty(permutations.shape[0], dtype=np.result_type(self.dist, self.costs))
+        for start in range(0, s.shape[0], chunk_size):
+            chunk = s[start:start + chunk_size]
+            res[start:start + chunk_size] = flat_b.take(chunk[:, rows] * self.n + chunk[:, columns]) @ weights
+        return res
+
+    def swap_delta(self, permutation: np.ndarray, i: int, j: int) -> int:
+        """`swap_delta` of positions i and j, O(length of rows i and j) for sparse instances."""
+        if i == j:
+            return 0
+        if not (self.sparse_rows or self.structure.symmetric):
+            return swap_delta(self.dist, self.costs, permutation, i, j)
+        s, x, y = self._arguments(permutation, i, j)
+        sx, sy = s[x], s[y]
+        res = self._corners(x, y, sx, sy)
+        if not self.sparse_rows:
+            side_a, side_b = self.sides[0]
+            terms = (side_a[x] - side_a[y]) * (side_b[sy, s] - side_b[sx, s])
+            return res + terms.sum() - terms[x] - terms[y]
+        for columns, values, side_b in self.csr_rows:
+            b_x, b_y = side_b[sx], side_b[sy]
+            for row, sign in ((x, 1), (y, -1)):
+                for k, value in zip(columns[row], values[row]):
+                    if k != x and k != y:
+                        sk = s[k]
+                        res += sign * value * (b_y[sk] - b_x[sk])
+        return res
+
+    def batch_swap_delta(self, permutations: np.ndarray, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+        """`batch_swap_delta` of m permutations, O(m * row length) for sparse instances."""
+        if not (self.sparse_rows or self.structure.symmetric):
+            return batch_swap_delta(self.dist, self.costs, permutations, i, j)
+        s, x, y = self._batch_arguments(permutations, i, j)
+        rows = np.arange(s.shape[0])
+        sx, sy = s[rows, x], s[rows, y]
+        res = self._corners(x, y, sx, sy)
+        if not self.sparse_rows:
+            side_a, side_b = self.sides[0]
+            terms = (side_a[x] - side_a[y]) * (side_b[sy[:, None], s] - side_b[sx[:, None], s])
+            return res + terms.sum(axis=1) - terms[rows, x] - terms[rows, y]
+        for (columns, values), (_, side_b) in zip(self.ell_rows, self.sides):
+            for row, sign in ((x, 1), (y, -1)):
+                k = columns[row]
+                sk = s[rows[:, None], k]
+                weights = np.where((k != x[:, None]) & (k != y[:, None]), values[row], 0)
+                res += sign * (weights * (side_b[sy[:, None], sk] - side_b[sx[:, None], sk])).sum(axis=1)
+        return res
@@ -0,0 +1 @@
+from .annealing_solver import annealing_solver
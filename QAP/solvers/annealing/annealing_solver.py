@@ -0,0 +1,116 @@
+from typing import Callable, List, Optional, Type, Union
+import numpy as np
+import re
+from QAP.objective import objective
+from QAP.instance import QAPInstance, as_instance
+from QAP.utils.solver_utils import generate_random_solutions
+from QAP.utils.solution_representation import SolutionRepresentation
+from QAP.solvers.stopping_criteria import StoppingCriteria
+from QAP.solvers.callbacks import Callback, Callbacks
+from .cooling_schedules import CoolingSchedule, GeometricCooling
+
+
+def annealing_solver(n: Union[int, QAPInstance],
+                     dist: Optional[np.ndarray] = None,
+                     cost: Optional[np.ndarray] = None,
+                     objective: Callable[[np.ndarray, np.ndarray, np.ndarray],
+                                         int] = objective,
+                     max_iterations: int = 10000,
+                     chains: int = 32,
+                     verbose: bool = True,
+                     print_every: int = 1000,
+                     cooling_schedule: Type[CoolingSchedule] = GeometricCooling,
+                     initial_temperature: float = None,
+                     callbacks: Optional[List[Callback]] = None,
+                     **kwargs) -> SolutionRepresentation:
+    """Simulated annealing solver for QAP that advances many independent chains at once.
+    State of all chains is (chains, n) array of permutations, every iteration each chain proposes
+    random swap, all proposals are scored by vectorized O(n) deltas and accepted with Metropolis rule.
+    Args:
+        n: size of a problem or `QAPInstance` (then matrices are omitted)
+        dist: (optional) 2d distance matrix
+        cost: (optional) 2d cost matrix
+        objective: (optional) objective function, only standard QAP objective is supported
+        max_iterations: (optional) number of proposals made by each chain (cooling schedule depends on it,
+            so it can't be None)
+        chains: (optional) number of independent chains
+        verbose: (optional) weather to print intermediate results (adds `ProgressLogger` to callbacks)
+        print_every: (optional) frequency of prints
+        cooling_schedule: (optional) class that implements CoolingSchedule
+        initial_temperature: (optional) starting temperature, estimated from mean absolute delta of random swaps
+        callbacks: (optional) observers that receive `IterationEvent` after each iteration (chains are population)
+        kwargs: (optional) used to pass optional arguments to cooling_schedule and `StoppingCriteria` (`stopping_*`)
+    Returns:
+        Best solution across chains, `chain_costs` attribute holds best cost found by each chain,
+        `evaluations` number of evaluated proposals, `iterations` number of finished iterations
+        and `stop_reason` name of criterion that stopped the solver
+    """
+    instance = as_instance(n, dist, cost)
+    n = instance.n
+    evaluation = instance.bind(objective)
+    if evaluation.batch_delta is None:
+        raise ValueError('annealing_solver supports only standard QAP objective')
+
+    cooling_args = {
+        key: value
+        for key, value in kwargs.items()
+        if re.match('cooling_*', key)
+    }
+    stopping_args = {
+        key: value
+        for key, value in kwargs.items()
+        if re.match('stopping_*', key)
+    }
+    stopping = StoppingCriteria(**stopping_args)
+    callbacks = Callbacks('annealing', n, callbacks, verbose, print_every)
+
+    permutations = generate_random_solutions(n, size=chains)
+    costs = evaluation.batch_objective(permutations)
+    rows = np.arange(chains)
+
+    def propose():
+        i = np.random.randint(0, n, size=chains)
+        j = np.random.randint(0, n - 1, size=chains)
+        j += j >= i
+        return i, j, evaluation.batch_delta(permutations, i, j)
+
+    if initial_temperature is None:
+        initial_temperature = max(1.0, float(np.mean(np.abs(propose()[2]))))
+    cooling = cooling_schedule(initial_temperature, max_iterations, **cooling_args)
+
+    best_permutations, best_costs = permutations.copy(), costs.copy()
+
+    iteration = -1
+    for iteration in range(max_iterations):
+        i, j, deltas = propose()
+        temperature = cooling(iteration)
+        accept = (deltas <= 0) | (np.random.random_sample(chains) < np.exp(-np.maximum(deltas, 0) / temperature))
+
+        accepted = rows[accept]
+        i, j = i[accept], j[accept]
+        genes_i = permutations[accepted, i]
+        permutations[accepted, i] = permutations[accepted, j]
+        permutations[accepted, j] = genes_i
+        costs[accepted] += deltas[accept]
+
+        improved = costs < best_costs
+        best_permutations[improved] = permutations[improved]
+        best_costs[improved] = costs[improved]
+
+        if callbacks:
+            callbacks.iteration(iteration + 1, best_costs.min(), costs, (iteration + 2) * chains, permutations)
+        stop_reason = stopping(best_costs.min(), (iteration + 2) * chains)
+        if stop_reason is not None:
+            break
+    else:
+        stop_reason = StoppingCriteria.MAX_ITERATIONS
+
+    best_chain = int(np.argmin(best_costs))
+    best_solution = SolutionRepresentation(best_permutations[best_chain], calculate_cost=False)
+    best_solution.cost = best_costs[best_chain]
+    best_solution.chain_costs = best_costs
+    best_solution.evaluations = (iteration + 2) * chains
+    best_solution.iterations = iteration + 1
+    best_solution.stop_reason = stop_reason
+    callbacks.end(best_solution)
+    return best_solution
@@ -0,0 +1,49 @@
+class CoolingSchedule:
+    """Abstract class for cooling schedule.
+    Each descendant must implement `temperature` function that gets called with `()` syntax
+    Args:
+        initial_temperature: temperature at first iteration
+        max_iterations: number of iterations of the solver
+    """
+    def __init__(self, initial_temperature: float, max_iterations: int, *args, **kwargs):
+        self.initial_temperature = initial_temperature
+        self.max_iterations = max_iterations
+
+    def temperature(self, iteration: int) -> float:
+        raise NotImplementedError(
+            'this is abstract class method and should be implemented by descendants'
+        )
+
+    def __call__(self, *args, **kwargs):
+        return self.temperature(*args, **kwargs)
+
+
+class GeometricCooling(CoolingSchedule):
+    """Exponential cooling, temperature is multiplied by constant factor every iteration.
+    Args:
+        initial_temperature: temperature at first iteration
+        max_iterations: number of iterations of the solver
+        cooling_final_ratio: (optional) ratio of final and initial temperature
+    """
+    def __init__(self, initial_temperature: float, max_iterations: int, cooling_final_ratio: float = 1e-3):
+        super().__init__(initial_temperature, max_iterations)
+        self.alpha = cooling_final_ratio ** (1 / max(1, max_iterations))
+
+    def temperature(self, iteration: int) -> float:
+        return self.initial_temperature * self.alpha ** iteration
+
+
+class LinearCooling(CoolingSchedule):
+    """Temperature decreases linearly from initial to final temperature.
+    Args:
+        initial_temperature: temperature at first iteration
+        max_iterations: number of iterations of the solver
+        cooling_final_ratio: (optional) ratio of final and initial temperature
+    """
+    def __init__(self, initial_temperature: float, max_iterations: int, cooling_final_ratio: float = 1e-3):
+        super().__init__(initial_temperature, max_iterations)
+        self.final_temperature = initial_temperature * cooling_final_ratio
+
+    def temperature(self, iteration: int) -> float:
+        progress = iteration / max(1, self.max_iterations)
+        return self.initial_temperature + (self.final_temperature - self.initial_temperature) * progress
@@ -2,38 +2,70 @@
 # * https://www.researchgate.net/publication/260985621_The_Bees_Algorithm_Technical_Note
 # * https://link.springer.com/chapter/10.1007/978-3-319-23437-3_53
 import numpy as np
-from typing import Callable, Union, Type
-from functools import partial
+from typing import Callable, List, Optional, Union, Type
 import numpy as np
 import re
 from QAP.objective import objective
-from tqdm import tqdm
+from QAP.instance import QAPInstance, as_instance
 from ..selection_mechanisms import SelectionMechanism, BestFit
 from ..mutation_mechanisms import MutationMechanism, UniformMutationScheduler, SwapMutation
+from ..initialization_mechanisms import InitializationMechanism, RandomInitializer
+from ..stopping_criteria import StoppingCriteria, iterations
+from ..callbacks import Callback, Callbacks
 from .location import Location
-from QAP.utils.solver_utils import generate_random_solutions
-from multiprocessing import Pool
-from concurrent.futures import ThreadPoolExecutor
-import time
+from QAP.utils.population import Population
+from QAP.utils.evaluation_cache import EvaluationCache
+from QAP.utils.profiler import Profiler
+from QAP.utils.evaluation_pool import Pool, choose_backend, get_evaluation_pool
 
 
-def search_elite(elite, elite_search_size=1):
-    return elite.search_neighbourhood_elite(elite_search_size)
+def search_sites(instance: QAPInstance,
+                 objective_fn: Callable[[np.ndarray, np.ndarray, np.ndarray], int],
+                 mutation: MutationMechanism,
+                 lifetime: int,
+                 search_size: int,
+                 elite: bool,
+                 permutations: np.ndarray,
+                 costs: np.ndarray,
+                 ages: np.ndarray,
+                 profile: bool = False):
+    """Searches neighbourhood of each site, runs in worker of `EvaluationPool`.
+    Returns:
+        permutations, costs and ages of best neighbours for elite sites or updated selected sites,
+        numbers of full and delta evaluations of neighbours and `Profiler` phases of the worker
+        (None if `profile` is not set)
+    """
+    profiler = Profiler(enabled=profile)
+    evaluation = instance.bind(objective_fn)
+    evaluation = evaluation._replace(objective=profiler.wrap('evaluation', evaluation.objective),
+                                     batch_objective=profiler.wrap('evaluation', evaluation.batch_objective),
+                                     delta=profiler.wrap('delta_evaluation', evaluation.delta),
+                                     batch_delta=profiler.wrap('delta_evaluation', evaluation.batch_delta),
+                                     reevaluate=profiler.wrap('reevaluation', evaluation.reevaluate))
 
-
-def search_selected(selected, selected_search_size=1):
-    return selected.search_neighbourhood(selected_search_size)
-
-
-def init_fn():
-    s = int(time.time() * 100000) % 1000
-    np.random.seed(s)
-    print(f'worker seed {np.random.get_state()[1][0]}')
+    permutations = permutations.copy()
+    costs = costs.copy()
+    ages = ages.copy()
+    counts = np.zeros(2, dtype=np.int64)
+    for idx in range(permutations.shape[0]):
+        location = Location(permutations[idx], mutation, calculate_cost=False, cost=costs[idx], age=ages[idx],
+                            evaluation=evaluation, lifetime=lifetime)
+        if elite:
+            neighbour = location.search_neighbourhood_elite(search_size)
+            neighbour.age = 0
+        else:
+            neighbour = location.search_neighbourhood(search_size)
+        counts += location.evaluations, location.delta_evaluations
+        location = neighbour
+        permutations[idx] = location.permutation
+        costs[idx] = location.cost
+        ages[idx] = location.age
+    return permutations, costs, ages, counts, profiler.phases if profile else None
 
 
-def bees_solver(n: int,
-                dist: np.ndarray,
-                cost: np.ndarray,
+def bees_solver(n: Union[int, QAPInstance],
+                dist: Optional[np.ndarray] = None,
+                cost: Optional[np.ndarray] = None,
                 objective: Callable[[np.ndarray, np.ndarray, np.ndarray],
                                     int] = objective,
                 max_iterations: int = 100,
@@ -42,6 +74,7 @@ def bees_solver(n: int,
                 print_every: int = 100,
                 mutation_mechanism: Type[MutationMechanism] = UniformMutationScheduler,
                 selection_mechanism: Type[SelectionMechanism] = BestFit,
+                initializer: Type[InitializationMechanism] = RandomInitializer,
                 solution_lifetime: int = -1,
                 elite_population: Union[float, int] = 0.01,
                 selected_population: Union[float, int] = 0.49,
@@ -49,9 +82,53 @@ def bees_solver(n: int,
                 selected_search_size: Union[float, int] = 0.01,
                 bad_epoch_patience: int = 20,
                 thread_pool_size: int = 6,
+                backend: str = 'auto',
+                pool: Optional[Pool] = None,
+                callbacks: Optional[List[Callback]] = None,
+                profile: bool = False,
+                cache_size: int = 10000,
                 **kwargs) -> np.ndarray:
-    objective = partial(objective, dist, cost)
-    Location.objective = objective
+    """Bees algorithm solver for QAP, neighbourhoods of sites are searched in processes of `EvaluationPool`.
+    Args:
+        n: size of a problem or `QAPInstance` (then matrices are omitted)
+        dist: (optional) 2d distance matrix
+        cost: (optional) 2d cost matrix
+        objective: (optional) objective function (module level function, it is sent to worker processes)
+        max_iterations: (optional) computational budget, None to rely only on stopping criteria
+        population_size: (optional) size of the population
+        verbose: (optional) weather to print intermediate results (adds `ProgressLogger` to callbacks)
+        print_every: (optional) frequency of prints
+        mutation_mechanism: (optional) class that implements MutationMechanism and generates neighbours
+        selection_mechanism: (optional) class that implements SelectionMechanism and selects sites
+        initializer: (optional) class that implements InitializationMechanism and generates initial sites
+            and scouts (random, greedy or GRASP)
+        solution_lifetime: (optional) number of iterations without improvement after which site is abandoned
+            (replaced with random permutation), -1 keeps sites forever
+        elite_population: (optional) number (or fraction of population) of elite sites
+        selected_population: (optional) number (or fraction of population) of selected sites
+        elite_search_size: (optional) number (or fraction of population) of neighbours of elite site
+        selected_search_size: (optional) number (or fraction of population) of neighbours of selected site
+        bad_epoch_patience: (optional) number of allowed bad epochs before perturbation
+        thread_pool_size: (optional) number of workers (processes or threads)
+        backend: (optional) 'serial', 'thread', 'process' or 'auto' (chosen by `choose_backend` from time
+            of evaluation of one iteration worth of neighbours, never threads), search of sites is a Python loop
+            that holds GIL and uses global random generator, so 'thread' gives no speed-up and is not reproducible
+        pool: (optional) pool of any backend to use instead of shared pool with `thread_pool_size` workers
+        callbacks: (optional) observers that receive `IterationEvent` after each iteration
+        profile: (optional) measure time and calls of phases of the algorithm (see `Profiler`),
+            phases measured in workers are prefixed with `worker_` and their times are summed over workers
+        cache_size: (optional) capacity of `EvaluationCache` of costs of seen permutations, 0 disables it
+        kwargs: (optional) used to pass optional arguments to components and `StoppingCriteria` (`stopping_*`)
+    Returns:
+        Solution that achieves the best objective score on the task, `evaluations` attribute holds number of
+        evaluated solutions, `iterations` number of finished iterations and `stop_reason` name of criterion
+        that stopped the solver, with `profile` set `profile` attribute holds report of `Profiler`,
+        `cache_stats` holds hits, misses and hit rate of cache
+    """
+    profiler = Profiler(enabled=profile)
+    instance = as_instance(n, dist, cost)
+    n = instance.n
+    evaluation = instance.bind(objective)
 
     # get args for each component
     mutation_args = {
@@ -64,6 +141,16 @@ def bees_solver(n: int,
         for key, value in kwargs.items()
         if re.match('selection_*', key)
     }
+    initializer_args = {
+        key: value
+        for key, value in kwargs.items()
+        if re.match('initializer_*', key)
+    }
+    stopping_args = {
+        key: value
+        for key, value in kwargs.items()
+        if re.match('stopping_*', key)
+    }
 
     def float_to_int(num: Union[float, int]) -> int:
         if isinstance(num, float):
@@ -77,54 +164,101 @@ def bees_solver(n: int,
 
     mutation = mutation_mechanism(**mutation_args)
     selection = selection_mechanism(selected_population, **selection_args)
+    initialization = initializer(**initializer_args)
+    stopping = StoppingCriteria(**stopping_args)
+    callbacks = Callbacks('bees', n, callbacks, verbose, print_every)
 
-    Location.solution_lifetime = solution_lifetime
+    population = Population(n, population_size + elite_population,
+                            profiler.wrap('evaluation', evaluation.batch_objective),
+                            profiler.wrap('delta_evaluation', evaluation.delta),
+                            reevaluate=profiler.wrap('reevaluation', evaluation.reevaluate),
+                            cache=EvaluationCache(cache_size) if cache_size > 0 else None)
+    with profiler.phase('initialization'):
+        population.add(initialization(instance, population_size))
 
-    population = np.array([
-        Location(solution, mutation)
-        for solution in generate_random_solutions(n, size=population_size)
-    ])
+    # persistent pool, matrices are placed in shared memory once and workers keep instance between calls
+    if pool is None:
+        if backend == 'auto':
+            neighbours = elite_population * elite_search_size + selected_population * selected_search_size
+            backend = choose_backend(instance, neighbours, thread_pool_size, objective, python_loop=True)
+        pool = get_evaluation_pool(thread_pool_size, backend)
+    blocks = pool.share(instance)
 
-    p = Pool(thread_pool_size, initializer=init_fn)
-    #p = ThreadPoolExecutor(thread_pool_size, initializer=init_fn)
+    def get_best(idx: int) -> Location:
+        return Location(population.permutations[idx].copy(), mutation, calculate_cost=False,
+                        cost=population.costs[idx], evaluation=evaluation, lifetime=solution_lifetime)
 
-    bad_epoch_counter = 0
-    best_solution = min(population)
-    search_elite_fn = partial(search_elite, elite_search_size=elite_search_size)
-    search_selected_fn = partial(search_selected, selected_search_size=selected_search_size)
+    def search(idxs: np.ndarray, search_size: int, elite: bool):
+        chunks = [chunk for chunk in np.array_split(idxs, pool.processes) if len(chunk) > 0]
+        with profiler.phase('pool'):
+            results = pool.starmap(search_sites, blocks, [
+                (objective, mutation, solution_lifetime, search_size, elite,
+                 population.permutations[chunk], population.costs[chunk], population.ages[chunk], profile)
+                for chunk in chunks
+            ])
+        if not results:
+            return np.empty((0, n), dtype=np.intp), np.empty(0), np.empty(0, dtype=np.int64)
+        for *_, worker_counts, worker_phases in results:
+            neighbour_evaluations[:] += worker_counts
+            for name, (elapsed, _, calls) in (worker_phases or {}).items():
+                profiler.add('worker_' + name, elapsed, calls)
+        return tuple(np.concatenate(arrays) for arrays in list(zip(*results))[:3])
 
-    iterator = tqdm(range(max_iterations)) if verbose else range(max_iterations)
-    for i in iterator:
-        if verbose and i % print_every == 0:
-            print(best_solution)
+    bad_epoch_counter = 0
+    best_solution = get_best(population.best())
+    # neighbours are evaluated in workers, each of them counts as one evaluation
+    search_evaluations = 0
+    neighbour_evaluations = np.zeros(2, dtype=np.int64)  # full and delta evaluations reported by workers
 
-        population.sort()
-        elite_locations, other_locations = population[:elite_population], population[elite_population:]
+    i = -1
+    for i in iterations(max_iterations):
+        with profiler.phase('selection'):
+            population.sort()
+            elite_idxs = np.arange(min(elite_population, len(population)))
+            selected_idxs = elite_population + selection(population.costs[elite_population:len(population)])
 
-        selected_locations = selection(other_locations)
+        neighbour_permutations, neighbour_costs, _ = search(elite_idxs, elite_search_size, elite=True)
 
-        elite_neighbourhood = p.map(search_elite_fn, elite_locations)
+        population.replace(selected_idxs, *search(selected_idxs, selected_search_size, elite=False))
 
-        selected_locations = p.map(search_selected_fn, selected_locations)
+        neighbour_idxs = population.add(neighbour_permutations, neighbour_costs)
+        search_evaluations += len(elite_idxs) * elite_search_size + len(selected_idxs) * selected_search_size
 
-        random_locations = np.array([
-            Location(solution, mutation)
-            for solution in generate_random_solutions(
-                n, size=max(0, population_size - elite_population - selected_population))
-        ])
+        with profiler.phase('scouts'):
+            random_idxs = population.add(initialization.reseed(
+                instance, max(0, population_size - elite_population - selected_population)))
 
-        population = np.concatenate([elite_locations, elite_neighbourhood, selected_locations, random_locations])
-        population_best = min(population)
-        if population_best.cost >= best_solution.cost:
+        population.keep(np.concatenate([elite_idxs, neighbour_idxs, selected_idxs, random_idxs]))
+        population_best = population.best()
+        if population.costs[population_best] >= best_solution.cost:
             bad_epoch_counter += 1
             if bad_epoch_counter >= bad_epoch_patience:
-                population = mutation(population)
-                for location in population:
-                    location.age = 0
+                with profiler.phase('restart'):
+                    mutation(population)
+                population.ages[:len(population)] = 0
                 bad_epoch_counter = 0
         else:
-            best_solution = population_best
+            best_solution = get_best(population_best)
 
-    p.close()
+        evaluations = population.evaluations + population.delta_evaluations + search_evaluations
+        if callbacks:
+            callbacks.iteration(i + 1, best_solution.cost, population.costs[:len(population)], evaluations,
+                                population.permutations[:len(population)])
+        stop_reason = stopping(best_solution.cost, evaluations)
+        if stop_reason is not None:
+            break
+    else:
+        stop_reason = StoppingCriteria.MAX_ITERATIONS
 
+    best_solution.evaluations = population.evaluations + population.delta_evaluations + search_evaluations
+    best_solution.iterations = i + 1
+    best_solution.stop_reason = stop_reason
+    if population.cache is not None:
+        best_solution.cache_stats = population.cache.stats()
+    if profile:
+        best_solution.profile = profiler.report(
+            iterations=i + 1,
+            evaluations=population.evaluations + int(neighbour_evaluations[0]),
+            delta_evaluations=population.delta_evaluations + int(neighbour_evaluations[1]))
+    callbacks.end(best_solution)
     return best_solution
@@ -1,38 +1,97 @@
 import numpy as np
+from typing import Tuple
 from QAP.utils.solution_representation import SolutionRepresentation
 from QAP.utils.solver_utils import generate_random_solutions
 from copy import copy
 
 
 class Location(SolutionRepresentation):
-    lifetime: int = -1
-
-    def __init__(self, permutation, mutation, calculate_cost=True):
-        super(Location, self).__init__(permutation, calculate_cost)
+    """Site of bees algorithm.
+    Args:
+        permutation: permutation that represents solution
+        mutation: mutation mechanism that generates neighbours
+        calculate_cost: (optional) weather to calculate cost when it is not given
+        cost: (optional) already known cost of permutation
+        age: (optional) number of iterations without improvement
+        evaluation: (optional) evaluation functions of instance (see `QAPInstance.bind`)
+        lifetime: (optional) number of iterations without improvement after which site is abandoned
+            (non-positive to keep sites forever)
+    Attributes:
+        evaluations: number of neighbours evaluated with full objective
+        delta_evaluations: number of neighbours evaluated with swap delta
+    """
+    def __init__(self, permutation, mutation, calculate_cost=True, cost=None, age=0, evaluation=None, lifetime=-1):
+        super(Location, self).__init__(permutation, calculate_cost and cost is None, evaluation)
+        if cost is not None:
+            self.cost = cost
         self.find_neighbors = mutation
-        self.age = 0
+        self.age = age
+        self.lifetime = lifetime
+        self.evaluations = 0
+        self.delta_evaluations = 0
 
     def increase_age(self):
-        if Location.lifetime > 0:
+        if self.lifetime > 0:
             self.age += 1
-            if self.age >= Location.lifetime:
+            if self.age >= self.lifetime:
                 self.age = 0
-                self.permutation = generate_random_solutions(self.permutation.shape[0], size=1)
+                self.permutation = generate_random_solutions(self.permutation.shape[0], size=1)[0]
+                self.calculate_cost()
 
-    def search_neighbourhood_elite(self, neighbourhood_size):
-        neighbourhood = self.find_neighbors([copy(self) for _ in range(neighbourhood_size)])
-        best_neighbour = min(neighbourhood)
+    def best_neighbour(self, neighbourhood_size) -> Tuple[np.ndarray, int]:
+        """Scores `neighbourhood_size` moves proposed by mutation in one batch and materializes only the best.
+        Swaps are scored with vectorized swap delta and other moves from their changed positions
+        (when objective supports it), otherwise with one batch evaluation of neighbours.
+        Mutations without `propose_moves` are applied to copies of location.
+        Returns:
+            permutation and cost of the best neighbour
+        """
+        n = self.permutation.shape[0]
+        try:
+            moves = self.find_neighbors.propose_moves(n, neighbourhood_size)
+        except NotImplementedError:
+            # copies keep cost of this location, so mutation can update it incrementally
+            best = min(self.find_neighbors([copy(self) for _ in range(neighbourhood_size)]))
+            self.evaluations += neighbourhood_size
+            return best.permutation, best.cost
 
-        self.increase_age()
+        deltas = np.zeros(moves.i.shape[0], dtype=np.asarray(self.cost).dtype)
+        full = moves.shift.copy()
+        if self.evaluation.batch_delta is None:
+            full[:] = True
+        else:
+            swaps = np.flatnonzero(~full)
+            deltas[swaps] = self.evaluation.batch_delta(np.broadcast_to(self.permutation, (swaps.shape[0], n)),
+                                                        moves.i[swaps], moves.j[swaps])
+            self.delta_evaluations += swaps.shape[0]
+        full = np.flatnonzero(full)
+        if full.shape[0] > 0 and self.evaluation.reevaluate is not None:
+            costs, incremental = self.evaluation.reevaluate(np.broadcast_to(self.permutation, (full.shape[0], n)),
+                                                            np.full(full.shape[0], self.cost),
+                                                            moves.take(full).apply(self.permutation))
+            deltas[full] = costs - self.cost
+            incremental_count = int(np.count_nonzero(incremental))
+            self.delta_evaluations += incremental_count
+            self.evaluations += full.shape[0] - incremental_count
+        elif full.shape[0] > 0:
+            deltas[full] = self.evaluation.batch_objective(moves.take(full).apply(self.permutation)) - self.cost
+            self.evaluations += full.shape[0]
 
-        return best_neighbour
+        best = np.argmin(deltas)
+        return moves.take(best).apply(self.permutation)[0], self.cost + deltas[best]
+
+    def search_neighbourhood_elite(self, neighbourhood_size):
+        permutation, cost = self.best_neighbour(neighbourhood_size)
+        self.increase_age()
+        return Location(permutation, self.find_neighbors, calculate_cost=False, cost=cost,
+                        evaluation=self.evaluation, lifetime=self.lifetime)
 
     def search_neighbourhood(self, neighbourhood_size):
-        neighbourhood = self.find_neighbors([copy(self) for _ in range(neighbourhood_size)])
-        best_neighbour = min(neighbourhood)
-        if best_neighbour < self:
+        permutation, cost = self.best_neighbour(neighbourhood_size)
+        if cost < self.cost:
             self.age = 0
-            self.permutation = best_neighbour.permutation
+            self.permutation = permutation
+            self.cost = cost
         else:
             self.increase_age()
         return self
@@ -41,4 +100,5 @@ class Location(SolutionRepresentation):
         return self.cost < other.cost
 
     def __copy__(self):
-        return Location(self.permutation.copy(), self.find_neighbors, calculate_cost=False)
+        return Location(self.permutation.copy(), self.find_neighbors, calculate_cost=False, cost=self.cost,
+                        evaluation=self.evaluation, lifetime=self.lifetime)
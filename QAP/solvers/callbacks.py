@@ -0,0 +1,177 @@
+import json
+import sys
+import time
+from typing import IO, Iterable, List, NamedTuple, Optional, Union
+
+import numpy as np
+
+
+class IterationEvent(NamedTuple):
+    """State of solver after finished iteration.
+    Attributes:
+        solver: name of solver
+        iteration: number of finished iterations
+        best_cost: best cost found so far
+        mean_cost: mean cost of current population (cost of current solution for single solution methods)
+        min_cost: minimal cost in current population
+        diversity: mean fraction of positions where solutions of population differ from the best one of them
+            (None for single solution methods)
+        evaluations: number of evaluated solutions (full and delta evaluations) so far
+        evaluations_per_second: average evaluation speed since start of solver
+        elapsed: seconds since start of solver
+    """
+    solver: str
+    iteration: int
+    best_cost: float
+    mean_cost: float
+    min_cost: float
+    diversity: Optional[float]
+    evaluations: int
+    evaluations_per_second: float
+    elapsed: float
+
+    def to_dict(self) -> dict:
+        # numpy scalars are not serializable
+        return {key: value.item() if isinstance(value, np.generic) else value
+                for key, value in self._asdict().items()}
+
+
+class Callback:
+    """Observer of solver progress, descendants override methods they are interested in."""
+    def on_start(self, solver: str, n: int):
+        pass
+
+    def on_iteration(self, event: IterationEvent):
+        pass
+
+    def on_end(self, result):
+        pass
+
+
+class ProgressLogger(Callback):
+    """Prints progress, at most once per `interval` seconds (or every `print_every` iterations if given).
+    Args:
+        interval: (optional) minimal number of seconds between prints
+        print_every: (optional) print every `print_every` iterations instead of time based throttling
+        file: (optional) stream to print to, stderr by default
+    """
+    def __init__(self, interval: float = 1.0, print_every: Optional[int] = None, file: Optional[IO] = None):
+        self.interval = interval
+        self.print_every = print_every
+        self.file = file
+        self.last_print = -np.inf
+
+    def on_iteration(self, event: IterationEvent):
+        if self.print_every is not None:
+            if (event.iteration - 1) % self.print_every != 0:
+                return
+        elif event.elapsed - self.last_print < self.interval:
+            return
+        self.last_print = event.elapsed
+        diversity = '' if event.diversity is None else f', diversity: {event.diversity:.3f}'
+        print(f'[{event.solver}] iteration {event.iteration}: best {event.best_cost}, '
+              f'mean {event.mean_cost:.1f}{diversity}, {event.evaluations_per_second:.0f} evaluations/s',
+              file=self.file or sys.stderr)
+
+    def on_end(self, result):
+        print(f'result: {result.cost}', file=self.file or sys.stderr)
+
+
+class JsonLinesLogger(Callback):
+    """Writes every `every`-th event as one JSON object per line (and final result as the last line).
+    Args:
+        path: path of output file or already opened text stream
+        every: (optional) log every `every`-th iteration
+    """
+    def __init__(self, path: Union[str, IO], every: int = 1):
+        self.path = path
+        self.every = every
+        self.file = None
+
+    def on_start(self, solver: str, n: int):
+        self.file = open(self.path, 'a') if isinstance(self.path, str) else self.path
+
+    def on_iteration(self, event: IterationEvent):
+        if event.iteration % self.every == 0:
+            self.file.write(json.dumps(event.to_dict()) + '\n')
+
+    def on_end(self, result):
+        self.file.write(json.dumps({
+            'result': np.asarray(result.cost).item(),
+            'permutation': np.asarray(result.permutation).tolist(),
+            'stop_reason': getattr(result, 'stop_reason', None),
+        }) + '\n')
+        if isinstance(self.path, str):
+            self.file.close()
+        else:
+            self.file.flush()
+
+
+class History(Callback):
+    """Keeps all events in memory, e.g. to plot convergence curves."""
+    def __init__(self):
+        self.events: List[IterationEvent] = []
+
+    def on_iteration(self, event: IterationEvent):
+        self.events.append(event)
+
+    def as_arrays(self) -> dict:
+        """Returns field name -> array of values over iterations."""
+        return {field: np.array([getattr(event, field) for event in self.events])
+                for field in IterationEvent._fields[1:]}
+
+
+class Callbacks:
+    """Group of callbacks attached to one solver run.
+    Solvers check `bool(callbacks)` before gathering data for event, so runs without observers pay nothing.
+    Args:
+        solver: name of solver reported in events
+        n: size of a problem
+        callbacks: (optional) callbacks given by user
+        verbose: (optional) add `ProgressLogger` that prints every `print_every` iterations
+        print_every: (optional) frequency of prints of verbose mode
+    """
+    def __init__(self,
+                 solver: str,
+                 n: int,
+                 callbacks: Optional[Iterable[Callback]] = None,
+                 verbose: bool = False,
+                 print_every: int = 100):
+        self.solver = solver
+        self.callbacks = [] if callbacks is None else list(callbacks)
+        if verbose:
+            self.callbacks.append(ProgressLogger(print_every=print_every))
+        self.start = time.perf_counter()
+        for callback in self.callbacks:
+            callback.on_start(solver, n)
+
+    def __bool__(self):
+        return len(self.callbacks) > 0
+
+    def iteration(self,
+                  iteration: int,
+                  best_cost,
+                  costs: np.ndarray,
+                  evaluations: int,
+                  permutations: Optional[np.ndarray] = None):
+        """Builds event and passes it to all callbacks.
+        Args:
+            iteration: number of finished iterations
+            best_cost: best cost found so far
+            costs: costs of current population (or current solution)
+            evaluations: number of evaluated solutions so far
+            permutations: (optional) permutations of current population used to measure diversity
+        """
+        elapsed = time.perf_counter() - self.start
+        costs = np.atleast_1d(costs)
+        diversity = None
+        if permutations is not None and permutations.shape[0] > 1:
+            diversity = float(np.mean(permutations != permutations[np.argmin(costs)]))
+        event = IterationEvent(self.solver, iteration, best_cost, float(np.mean(costs)), costs.min(), diversity,
+                               evaluations, evaluations / elapsed if elapsed > 0 else 0.0, elapsed)
+        for callback in self.callbacks:
+            callback.on_iteration(event)
+
+    def end(self, result):
+        for callback in self.callbacks:
+            callback.on_end(result)
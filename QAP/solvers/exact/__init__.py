@@ -0,0 +1 @@
+from .exact_solver import exact_solver
@@ -0,0 +1,267 @@
+# papers:
+# * Gilmore, P. C. (1962). Optimal and suboptimal algorithms for the quadratic assignment problem.
+# * Lawler, E. L. (1963). The quadratic assignment problem. Management Science, 9, 586-599.
+import heapq
+import re
+from typing import Callable, List, Optional, Tuple, Union
+import numpy as np
+from QAP.objective import objective
+from QAP.instance import QAPInstance, as_instance
+from QAP.bounds import linear_assignment, partial_gilmore_lawler_matrix
+from QAP.solvers.stopping_criteria import StoppingCriteria
+from QAP.solvers.callbacks import Callback, Callbacks
+from QAP.solvers.tabu import tabu_solver
+from QAP.utils.solution_representation import SolutionRepresentation
+from QAP.utils.evaluation_pool import EvaluationPool, get_evaluation_pool
+
+# locations of first k facilities of branching order
+Node = Tuple[int, ...]
+
+MAX_NODES = 'max_nodes'
+OPTIMAL = 'optimal'
+
+
+class BranchAndBound:
+    """Branch and bound over partial assignments of facilities (in fixed branching order) to locations.
+    Every expanded node is bounded with Gilmore-Lawler bound of its partial assignment, children are estimated
+    with reduced costs of the node's linear assignment (no extra LAP per child) and pruned against incumbent.
+    Optimal assignment of bound's LAP is a complete solution, so it is also used to improve incumbent.
+    Args:
+        instance: solved instance
+        order: branching order of facilities
+        incumbent_cost: cost of best known solution
+        incumbent: best known permutation
+        search: 'depth_first' or 'best_first'
+    """
+    def __init__(self,
+                 instance: QAPInstance,
+                 order: np.ndarray,
+                 incumbent_cost: float,
+                 incumbent: np.ndarray,
+                 search: str = 'depth_first'):
+        if search not in ('depth_first', 'best_first'):
+            raise ValueError(f'unknown search strategy {search}')
+        self.instance = instance
+        self.flows = instance.costs.astype(np.float64)
+        self.distances = instance.dist_t.astype(np.float64)
+        self.n = instance.n
+        self.order = order
+        self.incumbent_cost = incumbent_cost
+        self.incumbent = incumbent
+        self.search = search
+        self.nodes = 0
+        self._open: List = []
+        self._counter = 0  # tie breaker of heap
+        # objective of integer instance is integer, so only bounds below incumbent - 1 are interesting
+        self._tolerance = 1 - 1e-6 if np.issubdtype(instance.dtype, np.integer) else 1e-9
+
+    def promising(self, bound: float) -> bool:
+        return bound < self.incumbent_cost - self._tolerance
+
+    def push(self, estimate: float, node: Node):
+        if self.search == 'best_first':
+            heapq.heappush(self._open, (estimate, self._counter, node))
+            self._counter += 1
+        else:
+            self._open.append((estimate, node))
+
+    def pop(self) -> Tuple[float, Node]:
+        if self.search == 'best_first':
+            estimate, _, node = heapq.heappop(self._open)
+            return estimate, node
+        return self._open.pop()
+
+    def __len__(self):
+        return len(self._open)
+
+    def open_bound(self) -> float:
+        """Lower bound of optimum over not explored part of search tree (and incumbent)."""
+        return min([self.incumbent_cost] + [entry[0] for entry in self._open])
+
+    def _update_incumbent(self, permutation: np.ndarray):
+        permutation_cost = self.instance.objective(permutation)
+        if permutation_cost < self.incumbent_cost:
+            self.incumbent_cost, self.incumbent = permutation_cost, permutation
+
+    def expand(self, node: Node):
+        """Bounds node, updates incumbent with its LAP solution and pushes promising children."""
+        self.nodes += 1
+        k = len(node)
+        facilities = self.order[:k]
+        locations = np.array(node, dtype=np.intp)
+        fixed, matrix, free_facilities, free_locations = partial_gilmore_lawler_matrix(
+            self.flows, self.distances, facilities, locations)
+
+        assignment, value, row_duals, column_duals = linear_assignment(matrix, return_duals=True)
+        bound = fixed + value
+        if not self.promising(bound):
+            return
+
+        permutation = np.empty(self.n, dtype=np.intp)
+        permutation[facilities] = locations
+        permutation[free_facilities] = free_locations[assignment]
+        self._update_incumbent(permutation)
+        if free_facilities.shape[0] <= 1:  # LAP solution is the only completion
+            return
+
+        row = np.searchsorted(free_facilities, self.order[k])
+        estimates = bound + matrix[row] - row_duals[row] - column_duals
+        children = np.argsort(estimates, kind='stable')
+        if self.search == 'depth_first':
+            children = children[::-1]  # best child is popped first
+        for child in children:
+            if self.promising(estimates[child]):
+                self.push(estimates[child], node + (int(free_locations[child]),))
+
+    def run(self, max_nodes: Optional[int] = None, stopping: Optional[StoppingCriteria] = None,
+            callbacks: Optional[Callbacks] = None, check_every: int = 64) -> str:
+        """Explores open nodes until tree is exhausted or a limit is reached.
+        Returns:
+            'optimal' if whole tree was explored, 'max_nodes' or name of stopping criterion otherwise
+        """
+        while self._open:
+            if max_nodes is not None and self.nodes >= max_nodes:
+                return MAX_NODES
+            estimate, node = self.pop()
+            if not self.promising(estimate):  # incumbent improved since node was pushed
+                continue
+            self.expand(node)
+            if self.nodes % check_every == 0:
+                if callbacks:
+                    callbacks.iteration(self.nodes // check_every, self.incumbent_cost,
+                                        np.array([self.open_bound()]), self.nodes)
+                if stopping is not None:
+                    stop_reason = stopping(self.incumbent_cost, self.nodes)
+                    if stop_reason is not None:
+                        return stop_reason
+        return OPTIMAL
+
+
+def search_subtrees(instance: QAPInstance,
+                    order: np.ndarray,
+                    roots: List[Tuple[float, Node]],
+                    incumbent_cost: float,
+                    incumbent: np.ndarray,
+                    search: str,
+                    max_nodes: Optional[int],
+                    stopping_args: dict):
+    """Explores subtrees of given roots, runs in worker of `EvaluationPool`.
+    Returns:
+        best cost and permutation, number of expanded nodes, bound of unexplored nodes and reason of stop
+    """
+    tree = BranchAndBound(instance, order, incumbent_cost, incumbent, search)
+    for estimate, node in roots:
+        tree.push(estimate, node)
+    stop_reason = tree.run(max_nodes, StoppingCriteria(**stopping_args))
+    return tree.incumbent_cost, tree.incumbent, tree.nodes, tree.open_bound(), stop_reason
+
+
+def exact_solver(n: Union[int, QAPInstance],
+                 dist: Optional[np.ndarray] = None,
+                 cost: Optional[np.ndarray] = None,
+                 objective: Callable[[np.ndarray, np.ndarray, np.ndarray],
+                                     int] = objective,
+                 max_nodes: Optional[int] = 100000,
+                 search: str = 'depth_first',
+                 verbose: bool = True,
+                 print_every: int = 10,
+                 initial_solver: Optional[Callable] = tabu_solver,
+                 initial_iterations: Optional[int] = None,
+                 initial_permutation: Optional[np.ndarray] = None,
+                 processes: int = 1,
+                 pool: EvaluationPool = None,
+                 callbacks: Optional[List[Callback]] = None,
+                 **kwargs) -> SolutionRepresentation:
+    """Exact branch and bound solver for small QAP instances with Gilmore-Lawler bounding.
+    Args:
+        n: size of a problem or `QAPInstance` (then matrices are omitted)
+        dist: (optional) 2d distance matrix
+        cost: (optional) 2d cost matrix
+        objective: (optional) objective function, only standard QAP objective is supported
+        max_nodes: (optional) limit of expanded nodes (in total over processes), None for unlimited search
+        search: (optional) 'depth_first' (little memory, improves incumbent early)
+            or 'best_first' (expands node with the lowest bound first, tightest bound when stopped early)
+        verbose: (optional) weather to print intermediate results (adds `ProgressLogger` to callbacks)
+        print_every: (optional) frequency of prints (in batches of 64 expanded nodes)
+        initial_solver: (optional) heuristic solver that provides initial incumbent, None to start from
+            `initial_permutation` or random permutation
+        initial_iterations: (optional) `max_iterations` of `initial_solver`, 100 * n by default
+        initial_permutation: (optional) initial incumbent, used instead of `initial_solver`
+        processes: (optional) number of processes, subtrees of the first levels are split between them
+            (each process prunes with its own incumbent)
+        pool: (optional) `EvaluationPool` to use instead of shared pool with `processes` processes
+        callbacks: (optional) observers that receive `IterationEvent` every 64 expanded nodes
+            (`evaluations` count expanded nodes, `mean_cost` is bound of unexplored nodes)
+        kwargs: (optional) used to pass optional arguments to `StoppingCriteria` (`stopping_*`)
+    Returns:
+        Best found solution, `optimal` attribute tells if optimality was proven, `lower_bound` holds proven
+        lower bound of optimum, `nodes` number of expanded nodes and `stop_reason` is 'optimal', 'max_nodes'
+        or name of stopping criterion
+    """
+    instance = as_instance(n, dist, cost)
+    n = instance.n
+    if instance.bind(objective).delta is None:
+        raise ValueError('exact_solver supports only standard QAP objective')
+
+    stopping_args = {
+        key: value
+        for key, value in kwargs.items()
+        if re.match('stopping_*', key)
+    }
+    stopping = StoppingCriteria(**stopping_args)
+    callbacks = Callbacks('exact', n, callbacks, verbose, print_every)
+
+    if initial_permutation is None and initial_solver is not None:
+        initial_iterations = 100 * n if initial_iterations is None else initial_iterations
+        initial_permutation = initial_solver(instance, objective=objective, max_iterations=initial_iterations,
+                                             verbose=False).permutation
+    elif initial_permutation is None:
+        initial_permutation = np.random.permutation(n)
+    incumbent = np.asarray(initial_permutation, dtype=np.intp)
+
+    # facilities with the largest flows are assigned first, they constrain bound the most
+    order = np.argsort(-(instance.costs_column_sums + instance.costs_row_sums), kind='stable')
+
+    tree = BranchAndBound(instance, order, instance.objective(incumbent), incumbent, search)
+    tree.push(-np.inf, ())
+    if processes > 1:
+        # expand first levels in parent until there is enough subtrees to balance work
+        while 0 < len(tree) < 4 * processes and tree.nodes < (max_nodes or np.inf):
+            tree.expand(tree.pop()[1])
+        if len(tree) > 0:
+            roots = [tree.pop() for _ in range(len(tree))]
+            pool = get_evaluation_pool(processes) if pool is None else pool
+            blocks = pool.share(instance)
+            worker_nodes = None if max_nodes is None else max(1, (max_nodes - tree.nodes) // pool.processes)
+            results = pool.starmap(search_subtrees, blocks, [
+                (order, roots[worker::pool.processes], tree.incumbent_cost, tree.incumbent, search,
+                 worker_nodes, stopping_args)
+                for worker in range(pool.processes)
+            ], seeded=False)
+            open_bounds = [tree.incumbent_cost]
+            stop_reasons = []
+            for worker_cost, worker_incumbent, nodes, open_bound, worker_reason in results:
+                tree.nodes += nodes
+                open_bounds.append(open_bound)
+                stop_reasons.append(worker_reason)
+                if worker_cost < tree.incumbent_cost:
+                    tree.incumbent_cost, tree.incumbent = worker_cost, worker_incumbent
+            lower_bound = min(min(open_bounds), tree.incumbent_cost)
+            stop_reason = next((reason for reason in stop_reasons if reason != OPTIMAL), OPTIMAL)
+        else:
+            lower_bound = tree.incumbent_cost
+            stop_reason = OPTIMAL
+    else:
+        stop_reason = tree.run(max_nodes, stopping, callbacks)
+        lower_bound = tree.open_bound() if stop_reason != OPTIMAL else tree.incumbent_cost
+
+    best_solution = SolutionRepresentation(tree.incumbent, calculate_cost=False)
+    best_solution.cost = tree.incumbent_cost
+    best_solution.optimal = stop_reason == OPTIMAL
+    best_solution.lower_bound = lower_bound
+    best_solution.nodes = tree.nodes
+    best_solution.evaluations = tree.nodes
+    best_solution.iterations = tree.nodes
+    best_solution.stop_reason = stop_reason
+    callbacks.end(best_solution)
+    return best_solution
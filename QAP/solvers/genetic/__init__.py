@@ -1 +1,2 @@
 from .genetic_solver import genetic_solver
+from .island_solver import island_solver
@@ -1,18 +1,19 @@
 import numpy as np
-from typing import Callable
+from typing import Optional
+from QAP.instance import Evaluation
 from QAP.utils.solution_representation import SolutionRepresentation
+from QAP.utils.solver_utils import permutation_hash
 
 
 class Chromosome(SolutionRepresentation):
     """Represents solution for problem.
     Args:
-        objective: static function that should be set to objective function of our choice
         permutation: permutation that represents solution
-        cost: cost of the solution represented by permutation
         calculate_cost: (optional) weather to calculate cost function (we don't want to do it for elements that can be discarded immediately) # noqa
+        evaluation: (optional) evaluation functions of instance (see `QAPInstance.bind`)
     """
-    def __init__(self, permutation: np.ndarray, calculate_cost=True):
-        super().__init__(permutation, calculate_cost)
+    def __init__(self, permutation: np.ndarray, calculate_cost=True, evaluation: Optional[Evaluation] = None):
+        super().__init__(permutation, calculate_cost, evaluation)
 
     # basic utility functions
     def __gt__(self, other):
@@ -25,4 +26,4 @@ class Chromosome(SolutionRepresentation):
         return np.all(self.permutation == other.permutation)
 
     def __hash__(self):
-        return hash(tuple(self.permutation))
+        return permutation_hash(self.permutation)
@@ -1,29 +1,39 @@
 import numpy as np
-from .chromosome import Chromosome
-from typing import Tuple, List, Set, Union
-from QAP.utils.solver_utils import generate_random_solutions, get_liveness_score
+from typing import Tuple, Optional
+from QAP.utils.solver_utils import generate_random_solutions, get_liveness_score, row_hashes
+from QAP.utils.population import Population
 
 
 class CrossoverMechanism:
     """Abstract class for crossover mechanism.
-    Each descendant must implement `crossover` function that gets called with `()` syntax
+    Each descendant must implement `crossover` function that gets called with `()` syntax.
+    `crossover` accepts `Population` and returns (m, n) array of descendants permutations
     """
     def __init__(self, *args, **kwargs):
         pass
 
-    def crossover(self, generation: np.ndarray):
+    def crossover(self, population: Population) -> np.ndarray:
         raise NotImplementedError(
             'this is abstract class method and should be implemented by descendants'
         )
 
+    def offspring(self, population: Population) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Descendants with index of the closest parent of each of them (-1 if there is none), so solver can
+        evaluate descendants incrementally from their parents (see `Population.add`).
+        Returns:
+            (m, n) array of descendants permutations and parents (None if mechanism doesn't track them)
+        """
+        return self.crossover(population), None
+
     def __call__(self, *args, **kwargs):
         return self.crossover(*args, **kwargs)
 
 
-class OrderedCrossover(CrossoverMechanism):
-    """Ordered crossover.
-    Two partners are selected from population based on liveness factor.
-    Method leaves continuous subset of genes copied from one partner and order of other genes from second partner.
+class BatchCrossover(CrossoverMechanism):
+    """Abstract class for crossover mechanisms that breed all descendants in one pass.
+    Partners are selected from population based on liveness factor, all pairs and cut points
+    are sampled at once and each descendant must implement `cross_genes`,
+    that creates children for whole batch of partners with array operations.
     Each breading procedure generates 2 child
     Args:
         crossover_count: (optional) number of breading interactions (creates 2*crossover_count child)
@@ -33,7 +43,109 @@ class OrderedCrossover(CrossoverMechanism):
         self.count = crossover_count
         self.retry_count = crossover_retry
 
-    def _cross_genes(self, a: Chromosome, b: Chromosome) -> Chromosome:
+    @staticmethod
+    def _cut_points(m: int, n: int) -> np.ndarray:
+        """Samples span [start, finish) for each of m children.
+        Returns:
+            (m, n) boolean mask of genes inside span
+        """
+        start = np.random.randint(0, n, size=m)
+        finish = np.random.randint(0, n - 1, size=m)
+        finish += finish >= start
+        start, finish = np.minimum(start, finish), np.maximum(start, finish)
+        genes = np.arange(n)
+        return (genes >= start[:, None]) & (genes < finish[:, None])
+
+    def cross_genes(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        """Creates one child for every pair of partners.
+        Args:
+            a: (m, n) array of first partners permutations
+            b: (m, n) array of second partners permutations
+        Returns:
+            (m, n) array of new permutations
+        """
+        raise NotImplementedError(
+            'this is abstract class method and should be implemented by descendants'
+        )
+
+    def breed(self, population: Population, pairs_count: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Selects `pairs_count` pairs of distinct partners and creates 2 child from each pair.
+        Args:
+            population: current population
+            pairs_count: number of breading interactions
+        Returns:
+            (2*pairs_count, n) array of new permutations and index of partner that differs
+            from each child in fewer positions
+        """
+        size = len(population)
+        probs = get_liveness_score(population.costs[:size])
+        first = np.random.choice(size, size=pairs_count, p=probs)
+        second = np.random.choice(size, size=pairs_count, p=probs)
+        same = first == second
+        while np.any(same):  # equivalent to sampling pair without replacement
+            second[same] = np.random.choice(size, size=np.count_nonzero(same), p=probs)
+            same = first == second
+
+        permutations = population.permutations
+        a_idxs, b_idxs = np.concatenate([first, second]), np.concatenate([second, first])
+        a, b = permutations[a_idxs], permutations[b_idxs]
+        children = self.cross_genes(a, b)
+        closer_a = np.count_nonzero(children != a, axis=1) <= np.count_nonzero(children != b, axis=1)
+        return children, np.where(closer_a, a_idxs, b_idxs)
+
+    def crossover(self, population: Population) -> np.ndarray:
+        """Perform `crossover_count` crossovers based on liveness scores.
+        Descendants that duplicate each other or members of population are rejected by comparing
+        Zobrist hashes (the same as `Population.hashes`) and bred again.
+        Args:
+            population: current population
+        Returns:
+            (m, n) array of unique descendants permutations.
+        """
+        return self.offspring(population)[0]
+
+    def offspring(self, population: Population) -> Tuple[np.ndarray, np.ndarray]:
+        """`crossover` that also returns the closest partner of each descendant (-1 for random fill-up).
+        Args:
+            population: current population
+        Returns:
+            (m, n) array of unique descendants permutations and indices of their closest parents
+        """
+        target = 2 * self.count
+        descendants = np.empty((0, population.n), dtype=population.permutations.dtype)
+        parents = np.empty(0, dtype=np.intp)
+        hashes = np.empty(0, dtype=np.uint64)
+
+        c = 0
+        while descendants.shape[0] < target and c <= self.retry_count:
+            missing = target - descendants.shape[0]
+            children, children_parents = self.breed(population, (missing + 1) // 2)
+            children_hashes = row_hashes(children)
+            _, unique = np.unique(children_hashes, return_index=True)
+            unique = unique[~np.isin(children_hashes[unique], hashes) &
+                            ~np.isin(children_hashes[unique], population.hashes[:len(population)])][:missing]
+            descendants = np.concatenate([descendants, children[unique]])
+            parents = np.concatenate([parents, children_parents[unique]])
+            hashes = np.concatenate([hashes, children_hashes[unique]])
+            c += 1
+
+        if descendants.shape[0] < target:
+            parents = np.concatenate([parents, np.full(target - descendants.shape[0], -1, dtype=np.intp)])
+            descendants = np.concatenate([
+                descendants,
+                generate_random_solutions(population.n, target - descendants.shape[0])
+            ])
+        return descendants, parents
+
+
+class OrderedCrossover(BatchCrossover):
+    """Ordered crossover.
+    Method leaves continuous subset of genes copied from one partner and order of other genes from second partner.
+    Args:
+        crossover_count: (optional) number of breading interactions (creates 2*crossover_count child)
+        crossover_retry: (optional) number of retries to generate new chromosomes before falling to random chromosome generation # noqa
+    """
+    def cross_genes(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
         """Procedure of breading:
         1. Select span [i, j) that defines continuous subset of genes that are copied from parent a
         2. Select other not used genes from parent b with the same order
@@ -43,57 +155,61 @@ class OrderedCrossover(CrossoverMechanism):
                  ------------------
                  r: (1, 5, <2, 4,> 3)
         Args:
-            a: first partner (for continuous subset)
-            b: second partner (for order of genes)
+            a: (m, n) array of first partners (for continuous subset)
+            b: (m, n) array of second partners (for order of genes)
         Returns:
-            New chromosome (Note: we don't calculate cost because we can discard this element in next steps)
+            (m, n) array of new permutations (Note: we don't calculate cost because we can discard them in next steps)
         """
-        new_perm = np.zeros_like(a.permutation)
-        start, finish = np.sort(np.random.choice(new_perm.shape[0], size=2, replace=False))
-        parent_mask = np.zeros_like(new_perm, dtype=bool)
-        parent_mask[start:finish] = True
-        new_perm[parent_mask] = a.permutation[parent_mask]
-        new_perm[~parent_mask] = b.permutation[np.isin(b.permutation, a.permutation[parent_mask], invert=True)]
+        m, n = a.shape
+        parent_mask = self._cut_points(m, n)
+        in_span = np.zeros_like(parent_mask)  # in_span[r, g]: gene g is copied from a[r]
+        np.put_along_axis(in_span, a, parent_mask, axis=1)
+        from_b = ~np.take_along_axis(in_span, b, axis=1)
 
-        return Chromosome(new_perm, calculate_cost=False)
+        new_perm = np.empty_like(a)
+        new_perm[parent_mask] = a[parent_mask]
+        # every row has the same number of free positions and genes left in b, so row order is preserved
+        new_perm[~parent_mask] = b[from_b]
+        return new_perm
 
-    def cross_genes(self, a: Chromosome, b: Chromosome) -> Tuple[Chromosome, Chromosome]:
-        """Creates 2 child from partners.
-        Args:
-            a: first partner
-            b: second partner
-        Returns:
-            pair of new chromosomes
-        """
-        return self._cross_genes(a, b), self._cross_genes(b, a)
 
-    def crossover(self, population: np.ndarray) -> np.ndarray:
-        """Perform `crossover_count` crossovers based on liveness scores.
+class PartiallyMappedCrossover(BatchCrossover):
+    """Partially mapped crossover (PMX).
+    Method copies continuous subset of genes from one partner and positions of other genes from second partner,
+    conflicting genes are resolved by mapping defined by the copied span.
+    Args:
+        crossover_count: (optional) number of breading interactions (creates 2*crossover_count child)
+        crossover_retry: (optional) number of retries to generate new chromosomes before falling to random chromosome generation # noqa
+    """
+    def cross_genes(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        """Procedure of breading:
+        1. Select span [i, j) that defines continuous subset of genes that are copied from parent a
+        2. Copy other genes from parent b, replacing gene g that is already in the span with b[position of g in a]
+           until gene is not in the span
+        Example: a: (3, 5, <2, 4,> 1)
+                 b: (2, 1, 4, 5, 3)
+                 i, j = 2, 4
+                 ------------------
+                 r: (5, 1, <2, 4,> 3)
         Args:
-            population: current population of chromosomes
+            a: (m, n) array of first partners (for continuous subset)
+            b: (m, n) array of second partners (for positions of other genes)
         Returns:
-            New population created by previously described procedure.
+            (m, n) array of new permutations
         """
-        descendants: Set[Chromosome] = set() # noqa
-        costs = np.array([p.cost for p in population])
-        probs = get_liveness_score(costs)
-
-        for _ in range(self.count):
-            child = self.cross_genes(
-                *np.random.choice(population, replace=False, size=2, p=probs))
-            c = 0
-            while child[0] in descendants and child[1] in descendants and c < self.retry_count:
-                child = self.cross_genes(
-                    *np.random.choice(population, replace=False, size=2, p=probs))
-                c += 1
-            if c == self.retry_count:
-                child = [
-                    Chromosome(p, calculate_cost=False)
-                    for p in generate_random_solutions(child[0].permutation.shape[0], 2)
-                ]
-
-            descendants.update(child)
-        return np.array([d.calculate_cost() for d in descendants])  # don't forget to calculate cost
-
-
-# TODO: implement PMX crossover
+        m, n = a.shape
+        parent_mask = self._cut_points(m, n)
+        position_in_a = np.argsort(a, axis=1)
+        in_span = np.take_along_axis(parent_mask, position_in_a, axis=1)
+        mapping = np.where(in_span, np.take_along_axis(b, position_in_a, axis=1), np.arange(n))
+
+        # genes outside of the span reach fixed point after at most span length steps,
+        # genes at span positions of b may cycle in mapping, but they are overwritten with a anyway
+        genes = b
+        for _ in range(n):
+            mapped = np.take_along_axis(mapping, genes, axis=1)
+            converged = np.all((mapped == genes) | parent_mask)
+            genes = mapped
+            if converged:
+                break
+        return np.where(parent_mask, a, genes)
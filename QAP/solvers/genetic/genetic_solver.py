@@ -1,20 +1,27 @@
-from typing import Callable
-from functools import partial
+from typing import Callable, Optional, Union
 import numpy as np
 import re
-from QAP.utils.solver_utils import generate_random_solutions
 from QAP.solvers.selection_mechanisms import SelectionMechanism, RouletteWheel
 from QAP.solvers.mutation_mechanisms import MutationMechanism, SwapMutation
+from QAP.solvers.local_search_mechanisms import LocalSearchMechanism
+from QAP.solvers.initialization_mechanisms import InitializationMechanism, RandomInitializer
+from QAP.solvers.stopping_criteria import StoppingCriteria, iterations
+from QAP.solvers.callbacks import Callback, Callbacks
 from .crossover_mechanisms import CrossoverMechanism, OrderedCrossover
 from .chromosome import Chromosome
+from QAP.utils.population import Population
+from QAP.utils.evaluation_cache import EvaluationCache
+from QAP.utils.evaluation_pool import (Pool, choose_backend, get_evaluation_pool, parallel_batch_objective,
+                                       parallel_reevaluate)
+from QAP.utils.profiler import Profiler
 from QAP.objective import objective
-from tqdm import tqdm
-from typing import Type
+from QAP.instance import QAPInstance, as_instance
+from typing import List, Type
 
 
-def genetic_solver(n: int,
-                   dist: np.ndarray,
-                   cost: np.ndarray,
+def genetic_solver(n: Union[int, QAPInstance],
+                   dist: Optional[np.ndarray] = None,
+                   cost: Optional[np.ndarray] = None,
                    objective: Callable[[np.ndarray, np.ndarray, np.ndarray],
                                        int] = objective,
                    max_iterations: int = 100,
@@ -25,33 +32,72 @@ def genetic_solver(n: int,
                    mutation_mechanism: Type[MutationMechanism] = SwapMutation,
                    selection_mechanism: Type[SelectionMechanism] = RouletteWheel,
                    bad_epoch_patience: int = 20,
+                   local_search_mechanism: Type[LocalSearchMechanism] = None,
+                   initializer: Type[InitializationMechanism] = RandomInitializer,
+                   migration: Optional[Callable[[int, Population], None]] = None,
+                   callbacks: Optional[List[Callback]] = None,
+                   profile: bool = False,
+                   cache_size: int = 10000,
+                   processes: int = 1,
+                   backend: str = 'auto',
+                   pool: Optional[Pool] = None,
                    **kwargs) -> np.ndarray:
     """Genetic algorithm solver for QAP.
     Args:
-        n: size of a problem
-        dist: 2d distance matrix
-        cost: 2d cost matrix
+        n: size of a problem or `QAPInstance` (then matrices are omitted)
+        dist: (optional) 2d distance matrix
+        cost: (optional) 2d cost matrix
         objective: (optional) objective function that accepts dist, cost and permutation and returns calculated objective
-        max_iterations: (optional) computational budget
+        max_iterations: (optional) computational budget, None to rely only on stopping criteria
         population_size: (optional) size of the population
-        verbose: (optional) weather to print intermediate results
+        verbose: (optional) weather to print intermediate results (adds `ProgressLogger` to callbacks)
         print_every: (optional) frequency of prints
         crossover_mechanism: (optional) class that implements CrossoverMechanism and provides crossover mechanism
         mutation_mechanism: (optional) class that implements MutationMechanism and provides mutation mechanism
         selection_mechanism: (optional) class that implements SelectionMechanism and provides selection mechanism
         bad_epoch_patience: (optional) number of allowed bad epochs before perturbation
-        kwargs: (optional) used to pass optional arguments to selection_mechanism
+        local_search_mechanism: (optional) class that implements LocalSearchMechanism and improves descendants
+        initializer: (optional) class that implements InitializationMechanism and generates initial population
+            and solutions added on restart (random, greedy or GRASP)
+        migration: (optional) function called with iteration and population after each selection,
+            used by island model to exchange solutions between sub-populations
+        callbacks: (optional) observers that receive `IterationEvent` after each generation
+        profile: (optional) measure time and calls of phases of the algorithm (see `Profiler`)
+        cache_size: (optional) capacity of `EvaluationCache` of costs of seen permutations, 0 disables it
+        processes: (optional) number of workers that evaluate batches of descendants (full and incremental
+            evaluation), crossover, mutation, local search and selection run in calling process
+        backend: (optional) 'serial', 'thread', 'process' or 'auto' (chosen by `choose_backend` from time
+            of evaluation of one population), process backend requires module level objective
+        pool: (optional) pool of any backend to use instead of shared pool with `processes` workers
+        kwargs: (optional) used to pass optional arguments to components and `StoppingCriteria` (`stopping_*`)
     Returns:
-        Permutation that achieves the best objective score on the task
+        Permutation that achieves the best objective score on the task,
+        `evaluations`, `delta_evaluations` and `local_search_evaluations` attributes hold spent evaluations,
+        `iterations` number of finished generations and `stop_reason` name of criterion that stopped the solver,
+        with `profile` set `profile` attribute holds report of `Profiler` and `cache_stats` holds hits, misses
+        and hit rate of cache
     """
-    # generate initial population
-    objective = partial(objective, dist, cost)
-    Chromosome.objective = objective
+    profiler = Profiler(enabled=profile)
+    instance = as_instance(n, dist, cost)
+    n = instance.n
+    evaluation = instance.bind(objective)
+    batch_objective = evaluation.batch_objective
+    reevaluate = evaluation.reevaluate
+    if pool is None and processes > 1:
+        if backend == 'auto':
+            backend = choose_backend(instance, population_size, processes, objective)
+        pool = get_evaluation_pool(processes, backend)
+    if pool is not None and pool.processes > 1:
+        batch_objective = parallel_batch_objective(pool, instance, objective)
+        if reevaluate is not None:
+            reevaluate = parallel_reevaluate(pool, instance)
 
-    population = np.array([
-        Chromosome(solution)
-        for solution in generate_random_solutions(n, size=population_size)
-    ])
+    population = Population(n, 2 * population_size,
+                            profiler.wrap('evaluation', batch_objective),
+                            profiler.wrap('delta_evaluation', evaluation.delta),
+                            profiler.wrap('delta_evaluation', evaluation.row_deltas),
+                            profiler.wrap('reevaluation', reevaluate),
+                            EvaluationCache(cache_size) if cache_size > 0 else None)
 
     # get args for each component
     crossover_args = {
@@ -69,42 +115,93 @@ def genetic_solver(n: int,
         for key, value in kwargs.items()
         if re.match('selection_*', key)
     }
+    local_search_args = {
+        key: value
+        for key, value in kwargs.items()
+        if re.match('local_search_*', key)
+    }
+    initializer_args = {
+        key: value
+        for key, value in kwargs.items()
+        if re.match('initializer_*', key)
+    }
+    stopping_args = {
+        key: value
+        for key, value in kwargs.items()
+        if re.match('stopping_*', key)
+    }
 
     # initialize components
     crossover = crossover_mechanism(**crossover_args)
     mutation = mutation_mechanism(**mutation_args)
     selection = selection_mechanism(**selection_args)
+    local_search = local_search_mechanism(**local_search_args) if local_search_mechanism is not None else None
+    initialization = initializer(**initializer_args)
+    stopping = StoppingCriteria(**stopping_args)
+    callbacks = Callbacks('genetic', n, callbacks, verbose, print_every)
 
-    best_solution = max(population)
+    # generate initial population
+    with profiler.phase('initialization'):
+        population.add(initialization(instance, population_size))
+
+    def get_best(idx: int) -> Chromosome:
+        best = Chromosome(population.permutations[idx].copy(), calculate_cost=False, evaluation=evaluation)
+        best.cost = population.costs[idx]
+        return best
+
+    best_solution = get_best(population.best())
     bad_epoch_counter = 0
-    # TODO: probably use convergence criterion
-    iterator = tqdm(range(max_iterations)) if verbose else range(max_iterations)
-    for i in iterator:
-        if verbose and i % print_every == 0:
-            print(best_solution)
-        new_generation = mutation(crossover(population))
-        population = np.concatenate((population,
-                                     new_generation),
-                                    axis=0)
+    i = -1
+    for i in iterations(max_iterations):
+        with profiler.phase('crossover'):
+            children, parents = crossover.offspring(population)
+            descendants = population.add(children, parents=parents)
+        with profiler.phase('mutation'):
+            mutation(population, descendants)
+        if local_search is not None:
+            with profiler.phase('local_search'):
+                local_search(population, descendants)
 
-        population = selection(population)
-        population_best = max(population)
-        if best_solution.cost > population_best.cost:
-            best_solution = population_best
+        with profiler.phase('selection'):
+            population.keep(selection(population.costs[:len(population)]))
+        if migration is not None:
+            with profiler.phase('migration'):
+                migration(i, population)
+        population_best = population.best()
+        if best_solution.cost > population.costs[population_best]:
+            best_solution = get_best(population_best)
         else:
             bad_epoch_counter += 1
             if bad_epoch_counter == bad_epoch_patience:
-                population = mutation(population)
-                random_population = [
-                    Chromosome(solution) for solution in
-                    generate_random_solutions(n, size=population_size)
-                ]
-                population = np.concatenate((population,
-                                            random_population),
-                                            axis=0)
-                population_best = max(population)
-                best_solution = max(best_solution, population_best)
-                population = selection(population)
+                with profiler.phase('restart'):
+                    mutation(population)
+                    population.add(initialization.reseed(instance, population_size))
+                    population_best = population.best()
+                    if best_solution.cost > population.costs[population_best]:
+                        best_solution = get_best(population_best)
+                    population.keep(selection(population.costs[:len(population)]))
                 bad_epoch_counter = 0
 
+        if callbacks:
+            callbacks.iteration(i + 1, best_solution.cost, population.costs[:len(population)],
+                                population.evaluations + population.delta_evaluations,
+                                population.permutations[:len(population)])
+        stop_reason = stopping(best_solution.cost, population.evaluations + population.delta_evaluations)
+        if stop_reason is not None:
+            break
+    else:
+        stop_reason = StoppingCriteria.MAX_ITERATIONS
+
+    best_solution.evaluations = population.evaluations
+    best_solution.delta_evaluations = population.delta_evaluations
+    best_solution.local_search_evaluations = local_search.evaluations if local_search is not None else 0
+    best_solution.iterations = i + 1
+    best_solution.stop_reason = stop_reason
+    if population.cache is not None:
+        best_solution.cache_stats = population.cache.stats()
+    if profile:
+        best_solution.profile = profiler.report(iterations=i + 1,
+                                                evaluations=population.evaluations,
+                                                delta_evaluations=population.delta_evaluations)
+    callbacks.end(best_solution)
     return best_solution
@@ -0,0 +1,165 @@
+import multiprocessing as mp
+import pickle
+import traceback
+from queue import Empty
+from typing import Callable, List, Optional, Union
+import numpy as np
+from QAP.objective import objective
+from QAP.instance import QAPInstance, as_instance
+from QAP.utils.population import Population
+from .chromosome import Chromosome
+from .genetic_solver import genetic_solver
+
+
+class Migration:
+    """Exchanges best solutions of island with other islands every `interval` generations.
+    Migrants are sent as (permutations, costs) arrays and replace worst solutions of receiving island.
+    Args:
+        island: index of current island
+        inboxes: queues of all islands
+        interval: number of generations between migrations
+        migrants: number of solutions sent in each migration
+        topology: 'ring' (send to next island) or 'random' (send to random other island)
+    """
+    def __init__(self, island: int, inboxes: List, interval: int, migrants: int, topology: str):
+        if topology not in ('ring', 'random'):
+            raise ValueError(f'unknown migration topology {topology}')
+        self.island = island
+        self.inboxes = inboxes
+        self.interval = interval
+        self.migrants = migrants
+        self.topology = topology
+
+    def target(self) -> int:
+        islands = len(self.inboxes)
+        if self.topology == 'ring':
+            return (self.island + 1) % islands
+        return (self.island + np.random.randint(1, islands)) % islands
+
+    def __call__(self, iteration: int, population: Population):
+        if len(self.inboxes) < 2 or (iteration + 1) % self.interval != 0:
+            return
+        size = len(population)
+        migrants = min(self.migrants, size)
+        best = np.argpartition(population.costs[:size], migrants - 1)[:migrants]
+        self.inboxes[self.target()].put((population.permutations[best].copy(), population.costs[best].copy()))
+
+        while True:
+            try:
+                permutations, costs = self.inboxes[self.island].get_nowait()
+            except Empty:
+                break
+            m = min(len(costs), size)
+            worst = np.argpartition(-population.costs[:size], m - 1)[:m]
+            population.replace(worst, permutations[:m], costs[:m])
+
+
+def _run_island(island: int, seed: np.random.SeedSequence, inboxes: List, results,
+                instance: QAPInstance, objective: Callable,
+                migration_interval: int, migrants: int, migration_topology: str, kwargs: dict):
+    for inbox in inboxes:  # don't block exit on migrants that nobody will read
+        inbox.cancel_join_thread()
+    np.random.seed(seed.generate_state(1)[0])
+    try:
+        migration = Migration(island, inboxes, migration_interval, migrants, migration_topology)
+        best = genetic_solver(instance, objective=objective, verbose=False, migration=migration, **kwargs)
+    except Exception as error:
+        try:  # queue pickles in background thread, unpicklable error would be lost there
+            pickle.dumps(error)
+        except Exception:
+            error = RuntimeError(repr(error))
+        results.put((island, None, (error, traceback.format_exc())))
+        return
+    results.put((island, (best.permutation, best.cost, best.evaluations, best.stop_reason), None))
+
+
+def _collect_results(processes: List, results, poll_interval: float = 1.0) -> List:
+    """Waits for results of all islands, raises error of the first failed island (or of island process that
+    exited without result) after terminating the others.
+    Returns:
+        (island, permutation, cost, evaluations, stop_reason) tuples sorted by island
+    """
+    island_results = {}
+    try:
+        while len(island_results) < len(processes):
+            # results are flushed before process exits, so processes that exited before `get` timed out
+            # and are still missing will never report
+            exited = [island for island, process in enumerate(processes) if process.exitcode is not None]
+            try:
+                island, result, failure = results.get(timeout=poll_interval)
+            except Empty:
+                for island in exited:
+                    if island not in island_results:
+                        raise RuntimeError(f'island {island} exited with code {processes[island].exitcode} '
+                                           f'without result')
+                continue
+            if failure is not None:
+                error, remote_traceback = failure
+                raise error from RuntimeError(f'island {island} failed:\n{remote_traceback}')
+            island_results[island] = (island,) + result
+    except BaseException:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+        raise
+    return [island_results[island] for island in sorted(island_results)]
+
+
+def island_solver(n: Union[int, QAPInstance],
+                  dist: Optional[np.ndarray] = None,
+                  cost: Optional[np.ndarray] = None,
+                  objective: Callable[[np.ndarray, np.ndarray, np.ndarray],
+                                      int] = objective,
+                  islands: int = 4,
+                  migration_interval: int = 10,
+                  migrants: int = 2,
+                  migration_topology: str = 'ring',
+                  seed: int = None,
+                  **kwargs) -> Chromosome:
+    """Island model of genetic algorithm, each island runs `genetic_solver` in separate process.
+    Islands exchange migrants directly through queues, without synchronization through the parent process.
+    Args:
+        n: size of a problem or `QAPInstance` (then matrices are omitted), only matrices of instance
+            are sent to island processes
+        dist: (optional) 2d distance matrix
+        cost: (optional) 2d cost matrix
+        objective: (optional) objective function (module level function, it is sent to worker processes)
+        islands: (optional) number of islands (processes)
+        migration_interval: (optional) number of generations between migrations
+        migrants: (optional) number of solutions sent in each migration
+        migration_topology: (optional) 'ring' or 'random'
+        seed: (optional) entropy for `SeedSequence` that seeds islands
+        kwargs: (optional) arguments of `genetic_solver` used by each island (e.g. population_size per island),
+            `callbacks` are sent to island processes and observe each island separately
+    Returns:
+        Best solution among islands, `island_costs` attribute holds best cost of each island,
+        `evaluations` total number of full evaluations and `stop_reason` criterion that stopped the best island
+        (stopping criteria passed with `stopping_*` arguments apply to each island separately)
+    """
+    kwargs.pop('verbose', None)
+    instance = as_instance(n, dist, cost)
+    ctx = mp.get_context()
+    inboxes = [ctx.Queue() for _ in range(islands)]
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(target=_run_island,
+                    args=(island, island_seed, inboxes, results, instance, objective,
+                          migration_interval, migrants, migration_topology, kwargs))
+        for island, island_seed in enumerate(np.random.SeedSequence(seed).spawn(islands))
+    ]
+    for process in processes:
+        process.start()
+
+    island_results = _collect_results(processes, results)  # collect before join to avoid deadlock
+    for process in processes:
+        process.join()
+
+    island_costs = np.array([island_cost for _, _, island_cost, _, _ in island_results])
+    _, permutation, best_cost, _, stop_reason = island_results[int(np.argmin(island_costs))]
+    best_solution = Chromosome(permutation, calculate_cost=False)
+    best_solution.cost = best_cost
+    best_solution.island_costs = island_costs
+    best_solution.evaluations = sum(evaluations for _, _, _, evaluations, _ in island_results)
+    best_solution.stop_reason = stop_reason
+    return best_solution
@@ -0,0 +1,118 @@
+# papers:
+# * Li, Y., Pardalos, P. M., Resende, M. G. C. (1994). A greedy randomized adaptive search procedure
+#   for the quadratic assignment problem.
+import numpy as np
+from typing import Optional
+from QAP.instance import QAPInstance
+from QAP.utils.solver_utils import random_permutations
+
+
+def greedy_construction(instance: QAPInstance, size: int, rcl_size: int = 1) -> np.ndarray:
+    """Builds permutations by assigning facilities one by one (the largest total flow first) to the free location
+    with the lowest cost of flows to already assigned facilities plus flows to not yet assigned ones estimated
+    with mean distance to free locations (so the first facilities go to central locations).
+    All permutations are built at once, each step is a few (size, n) x (n, n) products.
+    Args:
+        instance: solved instance
+        size: number of permutations
+        rcl_size: (optional) size of restricted candidate list, location is drawn uniformly from `rcl_size`
+            cheapest free locations (1 for pure greedy construction)
+    Returns:
+        (size, n) array of permutations
+    """
+    n = instance.n
+    flows = instance.wide_costs.astype(np.float64)
+    distances = instance.wide_dist.astype(np.float64)
+    distances_t = np.ascontiguousarray(distances.T)
+    self_distances = np.diag(distances)
+    total_flows = (instance.costs_row_sums + instance.costs_column_sums).astype(np.float64)
+    order = np.argsort(-total_flows, kind='stable')
+
+    rows = np.arange(size)
+    permutations = np.empty((size, n), dtype=np.intp)
+    occupants = np.full((size, n), -1, dtype=np.intp)  # facility assigned to location, -1 if free
+    for step, facility in enumerate(order):
+        assigned = occupants >= 0
+        outgoing = np.where(assigned, flows[facility, occupants], 0.)
+        incoming = np.where(assigned, flows[occupants, facility], 0.)
+        scores = outgoing @ distances + incoming @ distances_t + flows[facility, facility] * self_distances
+        if step < n - 1:
+            unassigned = order[step + 1:]
+            free = (~assigned).astype(np.float64)
+            mean_distances = (free @ distances + free @ distances_t) / (2 * unassigned.shape[0])
+            scores += (flows[facility, unassigned].sum() + flows[unassigned, facility].sum()) * mean_distances
+        scores[assigned] = np.inf
+
+        k = min(rcl_size, n - step)
+        if k == 1:
+            locations = np.argmin(scores, axis=1)
+        else:
+            candidates = np.argpartition(scores, k - 1, axis=1)[:, :k]
+            locations = candidates[rows, np.random.randint(k, size=size)]
+        permutations[:, facility] = locations
+        occupants[rows, locations] = facility
+    return permutations
+
+
+class InitializationMechanism:
+    """Abstract class for initialization mechanism.
+    Each descendant must implement `initialize` function that gets called with `()` syntax.
+    `initialize` accepts instance and number of solutions and returns (size, n) array of permutations
+    of initial population, `reseed` generates solutions added to population later (restarts and scouts)
+    """
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def initialize(self, instance: QAPInstance, size: int) -> np.ndarray:
+        raise NotImplementedError(
+            'this is abstract class method and should be implemented by descendants'
+        )
+
+    def reseed(self, instance: QAPInstance, size: int) -> np.ndarray:
+        """Solutions that re-seed population, the same as initial ones by default."""
+        return self.initialize(instance, size)
+
+    def __call__(self, *args, **kwargs):
+        return self.initialize(*args, **kwargs)
+
+
+class RandomInitializer(InitializationMechanism):
+    """Uniformly random permutations, generated in one batch (see `random_permutations`)."""
+    def initialize(self, instance: QAPInstance, size: int) -> np.ndarray:
+        return random_permutations(instance.n, size)
+
+
+class GreedyInitializer(InitializationMechanism):
+    """Greedy flow x distance construction (see `greedy_construction`).
+    Greedy solution is deterministic, so it is only the first solution of initial population, the rest
+    and solutions that re-seed population are random (or GRASP constructions) to keep population diverse.
+    Args:
+        initializer_rcl_size: (optional) restricted candidate list size of GRASP construction of solutions
+            other than greedy one, None for random solutions
+    """
+    def __init__(self, initializer_rcl_size: Optional[int] = None):
+        self.rcl_size = initializer_rcl_size
+
+    def initialize(self, instance: QAPInstance, size: int) -> np.ndarray:
+        if size == 0:
+            return self.reseed(instance, size)
+        return np.concatenate([greedy_construction(instance, 1), self.reseed(instance, size - 1)])
+
+    def reseed(self, instance: QAPInstance, size: int) -> np.ndarray:
+        if self.rcl_size is None:
+            return random_permutations(instance.n, size)
+        return greedy_construction(instance, size, self.rcl_size)
+
+
+class GRASPInitializer(InitializationMechanism):
+    """Construction phase of GRASP, greedy construction that draws every location from restricted candidate list
+    (see `greedy_construction`). Solutions are close to greedy one but distinct, O(size * n^3) in total.
+    Args:
+        initializer_rcl_size: (optional) number of the cheapest free locations one is drawn from,
+            larger lists give more diverse but worse solutions
+    """
+    def __init__(self, initializer_rcl_size: int = 3):
+        self.rcl_size = initializer_rcl_size
+
+    def initialize(self, instance: QAPInstance, size: int) -> np.ndarray:
+        return greedy_construction(instance, size, self.rcl_size)
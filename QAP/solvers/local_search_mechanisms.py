@@ -0,0 +1,98 @@
+import numpy as np
+from typing import Optional, Union
+from QAP.utils.population import Population
+
+
+class LocalSearchMechanism:
+    """Abstract class for local search mechanism (memetic stage of genetic algorithm).
+    Improves chosen solutions of `Population` in place with 2-exchange moves and don't-look bits:
+    position whose swaps didn't improve solution is skipped until one of its neighbours changes.
+    Each descendant must implement `choose_move` that picks swap partner from vector of deltas.
+    Args:
+        local_search_fraction: (optional) fraction (float) or number (int) of improved solutions
+        local_search_elite: (optional) improve best solutions of population instead of random descendants
+        local_search_max_passes: (optional) maximal number of passes over all positions for one solution
+    Attributes:
+        evaluations: number of swap delta evaluations spent by local search
+            (full evaluations if population can't compute deltas)
+    """
+    def __init__(self,
+                 local_search_fraction: Union[float, int] = 0.1,
+                 local_search_elite: bool = False,
+                 local_search_max_passes: int = 5):
+        self.fraction = local_search_fraction
+        self.elite = local_search_elite
+        self.max_passes = local_search_max_passes
+        self.evaluations = 0
+
+    def choose_move(self, deltas: np.ndarray) -> Optional[int]:
+        """Returns improving swap partner or None if there is no improving move."""
+        raise NotImplementedError(
+            'this is abstract class method and should be implemented by descendants'
+        )
+
+    def improve_solution(self, population: Population, idx: int):
+        """Applies improving 2-exchange moves to solution idx until local optimum or `max_passes`."""
+        n = population.n
+        dont_look = np.zeros(n, dtype=bool)
+        evaluations = population.delta_evaluations + population.evaluations
+        for _ in range(self.max_passes):
+            improved = False
+            for i in np.random.permutation(n):
+                if dont_look[i]:
+                    continue
+                deltas = population.swap_deltas(idx, i)
+                j = self.choose_move(deltas)
+                if j is None:
+                    dont_look[i] = True
+                    continue
+                population.swap(idx, i, j, delta=deltas[j])
+                dont_look[[i, j]] = False
+                improved = True
+            if not improved:
+                break
+        self.evaluations += population.delta_evaluations + population.evaluations - evaluations
+
+    def improve(self, population: Population, descendants: np.ndarray) -> Population:
+        """Improves part of descendants (or best solutions of population when `local_search_elite` is set).
+        Args:
+            population: current population
+            descendants: indices of new solutions
+        Returns:
+            population after improvement.
+        """
+        candidates = np.arange(len(population)) if self.elite else np.asarray(descendants)
+        count = int(self.fraction * len(candidates)) if isinstance(self.fraction, float) else self.fraction
+        count = min(count, len(candidates))
+        if count <= 0:
+            return population
+
+        if self.elite:
+            targets = np.argpartition(population.costs[:len(population)], count - 1)[:count]
+        else:
+            targets = np.random.choice(candidates, size=count, replace=False)
+        for idx in targets:
+            self.improve_solution(population, idx)
+        return population
+
+    def __call__(self, *args, **kwargs):
+        return self.improve(*args, **kwargs)
+
+
+class FirstImprovement(LocalSearchMechanism):
+    """2-exchange local search that scans swap partners of each position in random order and takes
+    the first improving one. Deltas of all partners come from one vectorized row (see `Population.swap_deltas`),
+    so the scan itself costs no evaluations."""
+    def choose_move(self, deltas: np.ndarray) -> Optional[int]:
+        order = np.random.permutation(deltas.shape[0])
+        improving = order[deltas[order] < 0]
+        if improving.shape[0] == 0:
+            return None
+        return int(improving[0])
+
+
+class BestImprovement(LocalSearchMechanism):
+    """2-exchange local search that takes best improving swap for each position."""
+    def choose_move(self, deltas: np.ndarray) -> Optional[int]:
+        j = int(np.argmin(deltas))
+        return j if deltas[j] < 0 else None
@@ -1,11 +1,58 @@
 import numpy as np
-from typing import List, Union, Iterable, Type
+from typing import List, NamedTuple, Tuple, Union, Iterable, Type, Optional
 from QAP.utils.solution_representation import SolutionRepresentation
+from QAP.utils.population import Population
+
+
+class Moves(NamedTuple):
+    """Batch of candidate moves of one permutation (see `MutationMechanism.propose_moves`).
+    Move r takes element at position i[r] to position j[r]: swap exchanges both elements,
+    shift moves elements between them by one position towards i[r]. Moves with i[r] == j[r] change nothing.
+    """
+    i: np.ndarray
+    j: np.ndarray
+    shift: np.ndarray
+
+    @classmethod
+    def concatenate(cls, moves: List['Moves']) -> 'Moves':
+        return cls(*(np.concatenate(arrays) for arrays in zip(*moves)))
+
+    def take(self, idxs: Union[int, np.ndarray]) -> 'Moves':
+        """Moves with given indices."""
+        idxs = np.atleast_1d(idxs)
+        return Moves(self.i[idxs], self.j[idxs], self.shift[idxs])
+
+    def sources(self, n: int) -> np.ndarray:
+        """(k, n) array of source positions, `permutation[moves.sources(n)]` are all neighbours at once."""
+        positions = np.arange(n)
+        i, j = self.i[:, None], self.j[:, None]
+        shift = self.shift[:, None]
+        sources = np.broadcast_to(positions, (self.i.shape[0], n)).copy()
+        sources += shift & (i < j) & (positions >= i) & (positions < j)
+        sources -= shift & (i > j) & (positions > j) & (positions <= i)
+        rows = np.arange(self.i.shape[0])
+        swaps = ~self.shift
+        sources[rows[swaps], self.i[swaps]] = self.j[swaps]
+        sources[rows, self.j] = self.i
+        return sources
+
+    def apply(self, permutation: np.ndarray) -> np.ndarray:
+        """(k, n) array of neighbours of permutation."""
+        return permutation[self.sources(permutation.shape[0])]
+
+
+def random_pairs(n: int, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectors of `size` uniformly sampled pairs of distinct positions."""
+    i = np.random.randint(n, size=size)
+    j = np.random.randint(n - 1, size=size)
+    j += j >= i
+    return i, j
 
 
 class MutationMechanism:
     """Abstract class for mutation mechanism.
     Each descendant must implement `single_mutation` function that gets called from `mutate`
+    and `population_mutation` that mutates row of `Population` in place,
     or overwrite `mutate` function to achive different potentially better performing behaviour
     """
     def __init__(self, *args, **kwargs):
@@ -16,17 +63,42 @@ class MutationMechanism:
             'this is abstract class method and should be implemented by descendants'
         )
 
+    def population_mutation(self, population: Population, idx: int):
+        raise NotImplementedError(
+            'this is abstract class method and should be implemented by descendants'
+        )
+
+    def propose_moves(self, n: int, size: int) -> Moves:
+        """Samples `size` candidate moves at once, so neighbourhood can be scored with one array operation.
+        Optional, descendants that don't implement it are applied to copies of solution one by one.
+        Args:
+            n: size of a problem
+            size: number of moves
+        Returns:
+            `Moves` with the same distribution as `single_mutation`
+        """
+        raise NotImplementedError(
+            'this is abstract class method and should be implemented by descendants'
+        )
+
     def mutate(self,
-               population: Union[np.ndarray, Type[SolutionRepresentation]]) -> np.ndarray:
+               population: Union[np.ndarray, Population, Type[SolutionRepresentation]],
+               idxs: Optional[np.ndarray] = None) -> Union[np.ndarray, Population]:
         """Perform mutation defined in single_mutation on population or single representation.
         Args:
-            population: list of representations that might be mutated
+            population: list of representations or `Population` that might be mutated
+            idxs: (optional) indices of mutated solutions in `Population`, all alive solutions by default
         Returns:
             mutated population.
         """
         if isinstance(population, SolutionRepresentation):
             return self.single_mutation(population)
 
+        if isinstance(population, Population):
+            for idx in (range(len(population)) if idxs is None else idxs):
+                self.population_mutation(population, idx)
+            return population
+
         for representation in population:
             self.single_mutation(representation)
 
@@ -53,22 +125,61 @@ class SwapMutation(MutationMechanism):
             i, j = np.random.choice(representation.permutation.shape[0],
                                     size=2,
                                     replace=False)
-            representation.permutation[[i, j]] = representation.permutation[[j, i]]
-        return representation.calculate_cost()
+            return representation.swap(i, j)
+        if representation.cost == -1:
+            return representation.calculate_cost()
+        return representation
+
+    def population_mutation(self, population: Population, idx: int):
+        if np.random.sample() <= self.mutation_prob:
+            i, j = np.random.choice(population.n, size=2, replace=False)
+            population.swap(idx, i, j)
+
+    def propose_moves(self, n: int, size: int) -> Moves:
+        i, j = random_pairs(n, size)
+        keep = np.random.sample(size) > self.mutation_prob
+        j[keep] = i[keep]
+        return Moves(i, j, np.zeros(size, dtype=bool))
 
 
 class ShiftMutation(MutationMechanism):
-    def single_mutation(self, representation):
-        i, j = np.random.choice(representation.permutation.shape[0], size=(2,), replace=False)
+    @staticmethod
+    def _shift(permutation: np.ndarray):
+        i, j = np.random.choice(permutation.shape[0], size=(2,), replace=False)
         if i < j:  # shift right
-            tmp = representation.permutation[i]
-            representation.permutation[i:j] = representation.permutation[i+1:j+1]
-            representation.permutation[j] = tmp
+            tmp = permutation[i]
+            permutation[i:j] = permutation[i+1:j+1]
+            permutation[j] = tmp
         else:
-            tmp = representation.permutation[i]
-            representation.permutation[j+1:i+1] = representation.permutation[j:i]
-            representation.permutation[j] = tmp
-        return representation.calculate_cost()
+            tmp = permutation[i]
+            permutation[j+1:i+1] = permutation[j:i]
+            permutation[j] = tmp
+
+    def single_mutation(self, representation):
+        previous_permutation = representation.permutation.copy()
+        self._shift(representation.permutation)
+        return representation.update_cost(previous_permutation)
+
+    def population_mutation(self, population: Population, idx: int):
+        self.mutate(population, [idx])
+
+    def mutate(self,
+               population: Union[np.ndarray, Population, Type[SolutionRepresentation]],
+               idxs: Optional[np.ndarray] = None) -> Union[np.ndarray, Population]:
+        """Shifts rows of `Population` and updates their costs in one batch (incrementally for short shifts),
+        other arguments are handled by `MutationMechanism.mutate`."""
+        if not isinstance(population, Population):
+            return super().mutate(population, idxs)
+        idxs = np.arange(len(population)) if idxs is None else np.asarray(idxs, dtype=np.intp)
+        parents = population.permutations[idxs].copy()
+        for idx in idxs:
+            self._shift(population.permutations[idx])
+        population.reevaluate(idxs, parents)
+        return population
+
+    def propose_moves(self, n: int, size: int) -> Moves:
+        i, j = random_pairs(n, size)
+        return Moves(i, j, np.ones(size, dtype=bool))
 
 
 class UniformMutationScheduler(MutationMechanism):
@@ -76,5 +187,28 @@ class UniformMutationScheduler(MutationMechanism):
         self.mutations = mutation_mutations
 
     def single_mutation(self, representation):
-        mutation = np.random.choice(self.mutations)
+        mutation = self.mutations[np.random.randint(len(self.mutations))]
         return mutation(representation)
+
+    def population_mutation(self, population: Population, idx: int):
+        mutation = self.mutations[np.random.randint(len(self.mutations))]
+        mutation.population_mutation(population, idx)
+
+    def mutate(self,
+               population: Union[np.ndarray, Population, Type[SolutionRepresentation]],
+               idxs: Optional[np.ndarray] = None) -> Union[np.ndarray, Population]:
+        """Mutates rows of `Population` grouped by drawn mutation, so each mutation handles its rows in one batch,
+        other arguments are handled by `MutationMechanism.mutate`."""
+        if not isinstance(population, Population):
+            return super().mutate(population, idxs)
+        idxs = np.arange(len(population)) if idxs is None else np.asarray(idxs, dtype=np.intp)
+        drawn = np.random.randint(len(self.mutations), size=idxs.shape[0])
+        for k, mutation in enumerate(self.mutations):
+            if np.any(drawn == k):
+                mutation.mutate(population, idxs[drawn == k])
+        return population
+
+    def propose_moves(self, n: int, size: int) -> Moves:
+        counts = np.bincount(np.random.randint(len(self.mutations), size=size), minlength=len(self.mutations))
+        return Moves.concatenate([mutation.propose_moves(n, count)
+                                  for mutation, count in zip(self.mutations, counts)])
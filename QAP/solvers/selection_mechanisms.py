@@ -1,15 +1,16 @@
 import numpy as np
-from QAP.utils.solver_utils import get_liveness_score
+from QAP.utils.solver_utils import get_liveness_score, weighted_sample, stochastic_universal_sampling
 
 
 class SelectionMechanism:
     """Abstract class for selection mechanism.
-    Each descendant must implement `select` function that gets called with `()` syntax
+    Each descendant must implement `select` function that gets called with `()` syntax.
+    `select` accepts vector of solution costs and returns indices of selected solutions
     """
     def __init__(self, *args, **kwargs):
         pass
 
-    def select(self, generation: np.ndarray):
+    def select(self, costs: np.ndarray) -> np.ndarray:
         raise NotImplementedError(
             'this is abstract class method and should be implemented by descendants'
         )
@@ -21,26 +22,69 @@ class SelectionMechanism:
 class RouletteWheel(SelectionMechanism):
     """Randomly select sub-population from general population.
     Each sample is weighted by it's position in sorted
-    by cost array (higher the cost, lover the probability of surviving)
+    by cost array (higher the cost, lover the probability of surviving).
+    Selected solutions are distinct, O(m log m).
+    Args:
+        selection_size: (optional) number of selected solutions
     """
     def __init__(self, selection_size: int = 100):
         self.selection_size = selection_size
 
     def select(self,
-               population: np.ndarray) -> np.ndarray:
-        costs = np.array([p.cost for p in population])
-        probs = get_liveness_score(costs)
-        return np.random.choice(population,
-                                replace=False,
-                                size=self.selection_size,
-                                p=probs)
+               costs: np.ndarray) -> np.ndarray:
+        return weighted_sample(get_liveness_score(costs), self.selection_size)
 
 
 class BestFit(SelectionMechanism):
+    """Truncation selection of `selection_size` solutions with the lowest costs (ascending).
+    Only selected part is sorted (after `argpartition`), already sorted costs (bees sort population
+    before selection) are detected in O(m).
+    Args:
+        selection_size: (optional) number of selected solutions
+    """
+    def __init__(self, selection_size: int = 100):
+        self.selection_size = selection_size
+
+    def select(self,
+               costs: np.ndarray) -> np.ndarray:
+        m = costs.shape[0]
+        k = min(self.selection_size, m)
+        if np.all(costs[:-1] <= costs[1:]):
+            return np.arange(k)
+        if k == 0:
+            return np.arange(0)
+        top = np.argpartition(costs, k - 1)[:k]
+        return top[np.argsort(costs[top], kind='stable')]
+
+
+class Tournament(SelectionMechanism):
+    """Tournament selection, each selected solution is the best of `selection_tournament_size` contestants
+    drawn uniformly with replacement. Larger tournaments increase selection pressure, O(selection_size * t).
+    Args:
+        selection_size: (optional) number of tournaments (selected indices may repeat)
+        selection_tournament_size: (optional) number of contestants in tournament
+    """
+    def __init__(self, selection_size: int = 100, selection_tournament_size: int = 2):
+        self.selection_size = selection_size
+        self.tournament_size = selection_tournament_size
+
+    def select(self,
+               costs: np.ndarray) -> np.ndarray:
+        contestants = np.random.randint(costs.shape[0], size=(self.selection_size, self.tournament_size))
+        winners = np.argmin(costs[contestants], axis=1)
+        return contestants[np.arange(self.selection_size), winners]
+
+
+class StochasticUniversalSampling(SelectionMechanism):
+    """Stochastic universal sampling with liveness (rank) scores of `RouletteWheel`.
+    Single spin of wheel with `selection_size` equally spaced pointers, so every solution is selected
+    close to its expected number of times (selected indices may repeat), O(m log m).
+    Args:
+        selection_size: (optional) number of selected solutions
+    """
     def __init__(self, selection_size: int = 100):
         self.selection_size = selection_size
 
     def select(self,
-               population: np.ndarray) -> np.ndarray:
-        # TODO: add option to indicate that array is sorted? (in bees algorithm this is the case)
-        return np.sort(population)[:self.selection_size]
+               costs: np.ndarray) -> np.ndarray:
+        return stochastic_universal_sampling(get_liveness_score(costs), self.selection_size)
@@ -0,0 +1,83 @@
+import itertools
+import time
+from typing import Iterable, Optional
+
+
+class StoppingCriteria:
+    """Stopping criteria shared by all solvers.
+    Solver calls it once per iteration with best cost so far and number of spent evaluations,
+    it returns name of criterion that fired (or None to continue). Iteration limit is handled by solvers
+    themselves and reported as 'max_iterations'.
+    Args:
+        stopping_time: (optional) wall-clock budget in seconds, counted from creation of criteria
+        stopping_evaluations: (optional) maximal number of evaluated solutions (full and delta evaluations)
+        stopping_target: (optional) target cost, e.g. known optimum from .sln file
+        stopping_gap: (optional) allowed gap to `stopping_target` in percents, solver stops when
+            best cost <= target * (1 + gap / 100)
+        stopping_patience: (optional) number of iterations without improvement of best cost
+        stopping_lower_bound: (optional) proven lower bound of objective (see `QAP.bounds.lower_bound`)
+        stopping_bound_gap: (optional) solver stops when proven gap to `stopping_lower_bound` in percents
+            falls to this value, i.e. solution is provably good enough
+    """
+    TIME = 'time'
+    EVALUATIONS = 'evaluations'
+    TARGET = 'target'
+    STAGNATION = 'stagnation'
+    BOUND_GAP = 'bound_gap'
+    MAX_ITERATIONS = 'max_iterations'
+
+    def __init__(self,
+                 stopping_time: Optional[float] = None,
+                 stopping_evaluations: Optional[int] = None,
+                 stopping_target: Optional[float] = None,
+                 stopping_gap: float = 0.0,
+                 stopping_patience: Optional[int] = None,
+                 stopping_lower_bound: Optional[float] = None,
+                 stopping_bound_gap: float = 0.0):
+        self.max_time = stopping_time
+        self.max_evaluations = stopping_evaluations
+        self.target = None if stopping_target is None else stopping_target * (1 + stopping_gap / 100)
+        self.patience = stopping_patience
+        self.proven = None
+        if stopping_lower_bound is not None:
+            self.proven = stopping_lower_bound + abs(stopping_lower_bound) * stopping_bound_gap / 100
+        self.start = time.perf_counter()
+        self.best_cost = None
+        self.stagnation = 0
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def check(self, best_cost, evaluations: int = 0) -> Optional[str]:
+        """Updates state with results of finished iteration.
+        Args:
+            best_cost: best cost found so far
+            evaluations: number of evaluations spent so far
+        Returns:
+            name of criterion that fired or None
+        """
+        if self.best_cost is None or best_cost < self.best_cost:
+            self.best_cost = best_cost
+            self.stagnation = 0
+        else:
+            self.stagnation += 1
+
+        if self.target is not None and best_cost <= self.target:
+            return self.TARGET
+        if self.proven is not None and best_cost <= self.proven:
+            return self.BOUND_GAP
+        if self.max_evaluations is not None and evaluations >= self.max_evaluations:
+            return self.EVALUATIONS
+        if self.patience is not None and self.stagnation >= self.patience:
+            return self.STAGNATION
+        if self.max_time is not None and self.elapsed() >= self.max_time:
+            return self.TIME
+        return None
+
+    def __call__(self, *args, **kwargs):
+        return self.check(*args, **kwargs)
+
+
+def iterations(max_iterations: Optional[int]) -> Iterable[int]:
+    """Iteration numbers of solver loop, infinite if `max_iterations` is None (other criteria have to stop it)."""
+    return itertools.count() if max_iterations is None else range(max_iterations)
@@ -0,0 +1 @@
+from .tabu_solver import tabu_solver
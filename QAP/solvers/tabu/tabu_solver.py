@@ -0,0 +1,124 @@
+# papers:
+# * Taillard, E. (1991). Robust taboo search for the quadratic assignment problem. Parallel Computing, 17, 443-455.
+from typing import Callable, List, Optional, Union
+import numpy as np
+import re
+from QAP.objective import objective
+from QAP.instance import QAPInstance, as_instance
+from QAP.solvers.stopping_criteria import StoppingCriteria, iterations
+from QAP.solvers.callbacks import Callback, Callbacks
+from QAP.utils.solution_representation import SolutionRepresentation
+
+
+def tabu_solver(n: Union[int, QAPInstance],
+                dist: Optional[np.ndarray] = None,
+                cost: Optional[np.ndarray] = None,
+                objective: Callable[[np.ndarray, np.ndarray, np.ndarray],
+                                    int] = objective,
+                max_iterations: int = 1000,
+                verbose: bool = True,
+                print_every: int = 100,
+                tabu_min_tenure: Union[float, int] = 0.9,
+                tabu_max_tenure: Union[float, int] = 1.1,
+                tenure_change_every: Union[float, int] = 2.2,
+                aspiration: Union[float, int] = 5.0,
+                initial_permutation: np.ndarray = None,
+                callbacks: Optional[List[Callback]] = None,
+                **kwargs) -> SolutionRepresentation:
+    """Robust Tabu Search solver for QAP.
+    Each iteration evaluates whole swap neighbourhood in O(n^2) with `SwapDeltaMatrix`
+    and applies best move that is not tabu (or satisfies aspiration criterion).
+    Args:
+        n: size of a problem or `QAPInstance` (then matrices are omitted)
+        dist: (optional) 2d distance matrix
+        cost: (optional) 2d cost matrix
+        objective: (optional) objective function, only standard QAP objective is supported
+        max_iterations: (optional) computational budget, None to rely only on stopping criteria
+        verbose: (optional) weather to print intermediate results (adds `ProgressLogger` to callbacks)
+        print_every: (optional) frequency of prints
+        tabu_min_tenure: (optional) minimal tabu tenure (float is interpreted as fraction of n)
+        tabu_max_tenure: (optional) maximal tabu tenure (float is interpreted as fraction of n)
+        tenure_change_every: (optional) how often tenure is drawn again (float is interpreted as fraction of n)
+        aspiration: (optional) number of iterations after which move that wasn't made is forced
+            (float is interpreted as fraction of n^2)
+        initial_permutation: (optional) starting solution, random permutation by default
+        callbacks: (optional) observers that receive `IterationEvent` after each iteration
+        kwargs: (optional) used to pass optional arguments to `StoppingCriteria` (`stopping_*`),
+            other arguments are ignored, which allows to share configuration with other solvers
+    Returns:
+        Solution that achieves the best objective score on the task, `evaluations` attribute holds number of
+        evaluated swap deltas, `iterations` number of finished iterations and `stop_reason` name of criterion
+        that stopped the solver
+    """
+    instance = as_instance(n, dist, cost)
+    n = instance.n
+    if instance.bind(objective).delta is None:
+        raise ValueError('tabu_solver supports only standard QAP objective')
+
+    def float_to_int(num: Union[float, int], scale: int) -> int:
+        if isinstance(num, float):
+            return max(1, int(scale * num))
+        return num
+
+    tabu_min_tenure = float_to_int(tabu_min_tenure, n)
+    tabu_max_tenure = max(tabu_min_tenure, float_to_int(tabu_max_tenure, n))
+    tenure_change_every = float_to_int(tenure_change_every, n)
+    aspiration = float_to_int(aspiration, n * n)
+
+    stopping_args = {
+        key: value
+        for key, value in kwargs.items()
+        if re.match('stopping_*', key)
+    }
+    stopping = StoppingCriteria(**stopping_args)
+    callbacks = Callbacks('tabu', n, callbacks, verbose, print_every)
+    # initial matrix and every iteration evaluate all n(n-1)/2 swaps
+    neighbourhood_size = n * (n - 1) // 2
+
+    permutation = np.random.permutation(n) if initial_permutation is None else initial_permutation
+    deltas = instance.delta_matrix(permutation)
+    best_permutation, best_cost = deltas.permutation.copy(), deltas.cost
+
+    # tabu[i, l]: iteration until which assigning facility i to location l is forbidden
+    tabu = -(n * np.arange(n)[:, None] + np.arange(n)[None, :])
+    upper = np.triu(np.ones((n, n), dtype=bool), k=1)
+    tenure = tabu_max_tenure
+
+    i = -1
+    for i in iterations(max_iterations):
+        if i % tenure_change_every == 0:
+            tenure = np.random.randint(tabu_min_tenure, tabu_max_tenure + 1)
+
+        p = deltas.permutation
+        tabu_p = tabu[:, p]  # tabu_p[r, s]: facility r can't be moved to location of s
+        authorized = ((tabu_p < i) | (tabu_p.T < i)) & upper
+        aspired = (((tabu_p < i - aspiration) | (tabu_p.T < i - aspiration) |
+                    (deltas.cost + deltas.deltas < best_cost)) & upper)
+
+        candidates = aspired if aspired.any() else authorized
+        if candidates.any():  # otherwise all moves are tabu
+            r, s = np.unravel_index(np.argmin(np.where(candidates, deltas.deltas, np.inf)),
+                                    (n, n))
+
+            tabu[r, p[r]] = i + tenure
+            tabu[s, p[s]] = i + tenure
+            deltas.swap(r, s)
+
+            if deltas.cost < best_cost:
+                best_permutation, best_cost = deltas.permutation.copy(), deltas.cost
+
+        if callbacks:
+            callbacks.iteration(i + 1, best_cost, deltas.cost, (i + 2) * neighbourhood_size)
+        stop_reason = stopping(best_cost, (i + 2) * neighbourhood_size)
+        if stop_reason is not None:
+            break
+    else:
+        stop_reason = StoppingCriteria.MAX_ITERATIONS
+
+    best_solution = SolutionRepresentation(best_permutation, calculate_cost=False)
+    best_solution.cost = best_cost
+    best_solution.evaluations = (i + 2) * neighbourhood_size
+    best_solution.iterations = i + 1
+    best_solution.stop_reason = stop_reason
+    callbacks.end(best_solution)
+    return best_solution
@@ -1 +1 @@
-from .data_utils import load_example, load_solution  # noqa
+from .data_utils import load_example, load_solution, load_instance, load_matrices, iter_instances  # noqa
@@ -0,0 +1,223 @@
+import csv
+import inspect
+import json
+import os
+import time
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+from QAP.instance import QAPInstance
+from QAP.solvers.callbacks import JsonLinesLogger
+from QAP.utils.data_utils import load_solution
+from QAP.utils.evaluation_pool import close_evaluation_pools
+
+RUN_FIELDS = ['problem_name', 'size', 'optimal_solution', 'solver', 'rerun', 'seed', 'result', 'time', 'stop_reason']
+
+
+def _json_default(value):
+    # numpy scalars and arrays in profiler reports are not serializable
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+class Job(NamedTuple):
+    """Single benchmark run: one solver on one problem with deterministic seed."""
+    problem_path: str
+    solution_path: str
+    solver_name: str
+    config: dict
+    rerun: int
+    seed: int
+    stop_at_optimum: bool = True
+    curves_folder: Optional[str] = None
+    profile: bool = False
+    bound_gap: Optional[float] = None
+
+
+def job_seed(base_seed: int, problem_name: str, solver_name: str, rerun: int) -> int:
+    """Deterministic seed of a job, independent of scheduling order and other jobs."""
+    key = zlib.crc32(f'{problem_name}/{solver_name}/{rerun}'.encode())
+    return int(np.random.SeedSequence([base_seed, key]).generate_state(1)[0])
+
+
+def problem_size(problem_path: str) -> int:
+    """Reads only size of the problem from .dat file."""
+    with open(problem_path) as f:
+        for row in f:
+            if not row.isspace():
+                return int(row.split()[0])
+    raise ValueError(f'{problem_path} is empty')
+
+
+@lru_cache(maxsize=8)
+def load_problem(problem_path: str, solution_path: str) -> Tuple[QAPInstance, int]:
+    """Loads problem with matrices order that agrees with known optimal solution (order is cached after first load).
+    Instances are cached in worker, so reruns on the same problem share derived data (e.g. lower bound).
+    Returns:
+        instance and optimal objective
+    """
+    _, opt, _ = load_solution(solution_path)
+    return QAPInstance.load(problem_path, solution_path), opt
+
+
+def read_completed(results_path: str) -> Set[Tuple[str, str, int]]:
+    """Returns (problem_name, solver, rerun) of runs already stored in results file."""
+    if not os.path.exists(results_path):
+        return set()
+    with open(results_path, newline='') as f:
+        return {(row['problem_name'], row['solver'], int(row['rerun'])) for row in csv.DictReader(f)}
+
+
+def run_job(job: Job) -> dict:
+    """Runs single job (in worker process)."""
+    np.random.seed(job.seed)
+    instance, opt = load_problem(job.problem_path, job.solution_path)
+    config = dict(job.config)
+    solver = config.pop('solver')
+    if job.stop_at_optimum:
+        config.setdefault('stopping_target', opt)
+    if job.bound_gap is not None:
+        config.setdefault('stopping_lower_bound', instance.lower_bound())
+        config.setdefault('stopping_bound_gap', job.bound_gap)
+    if job.curves_folder is not None:
+        problem_name = os.path.splitext(os.path.basename(job.problem_path))[0]
+        curve_path = os.path.join(job.curves_folder, f'{problem_name}_{job.solver_name}_{job.rerun}.jsonl')
+        if os.path.exists(curve_path):  # left by interrupted run
+            os.remove(curve_path)
+        config['callbacks'] = [JsonLinesLogger(curve_path)]
+    if job.profile and 'profile' in inspect.signature(solver).parameters:
+        config['profile'] = True
+
+    start = time.time()
+    try:
+        res = solver(instance, **config)
+        end = time.time()
+    finally:  # atexit handlers don't run in executor workers, so pools would leak shared memory
+        close_evaluation_pools()
+
+    return {
+        'problem_name': os.path.basename(job.problem_path),
+        'size': instance.n,
+        'optimal_solution': opt,
+        'solver': job.solver_name,
+        'rerun': job.rerun,
+        'seed': job.seed,
+        'result': res.cost,
+        'time': end - start,
+        'stop_reason': getattr(res, 'stop_reason', ''),
+        'profile': getattr(res, 'profile', None),
+    }
+
+
+def run_benchmark(problems: List[Tuple[str, str]],
+                  solvers: Dict[str, dict],
+                  results_path: str,
+                  reruns_number: int = 3,
+                  processes: int = None,
+                  base_seed: int = 0,
+                  stop_at_optimum: bool = True,
+                  time_limit: float = None,
+                  curves_folder: str = None,
+                  profile_path: str = None,
+                  bound_gap: float = None) -> List[dict]:
+    """Runs every problem x solver x rerun job in process pool, largest problems first.
+    Each finished run is appended to `results_path` immediately and runs that are already there are skipped,
+    so interrupted benchmark can be resumed by running it again.
+    Args:
+        problems: pairs of paths to .dat and .sln files
+        solvers: solver name -> config with `solver` function and its keyword arguments
+        results_path: path to .csv file with results of single runs
+        reruns_number: (optional) number of runs of each solver on each problem
+        processes: (optional) number of worker processes, number of cpus by default
+        base_seed: (optional) seed from which seeds of all jobs are derived
+        stop_at_optimum: (optional) stop solvers as soon as they reach known optimal solution
+        time_limit: (optional) wall-clock budget of every run in seconds
+        curves_folder: (optional) folder for convergence curves, every run writes its iteration events
+            to `<problem>_<solver>_<rerun>.jsonl`
+        profile_path: (optional) path to JSON lines file with `Profiler` reports of runs,
+            solvers that support profiling (genetic and bees) are run with `profile=True`
+        bound_gap: (optional) stop solvers when gap to Gilmore-Lawler lower bound (in percents) falls to this value
+    Returns:
+        rows of runs finished by this call
+    """
+    completed = read_completed(results_path)
+    if time_limit is not None:
+        solvers = {name: dict(config, stopping_time=time_limit) for name, config in solvers.items()}
+    sizes = {problem_path: problem_size(problem_path) for problem_path, _ in problems}
+    jobs = [
+        Job(problem_path, solution_path, solver_name, config, rerun,
+            job_seed(base_seed, os.path.basename(problem_path), solver_name, rerun), stop_at_optimum,
+            curves_folder, profile_path is not None, bound_gap)
+        for problem_path, solution_path in problems
+        for solver_name, config in solvers.items()
+        for rerun in range(reruns_number)
+        if (os.path.basename(problem_path), solver_name, rerun) not in completed
+    ]
+    jobs.sort(key=lambda job: -sizes[job.problem_path])
+    print(f'{len(jobs)} jobs to run, {len(completed)} already done')
+
+    os.makedirs(os.path.dirname(results_path) or '.', exist_ok=True)
+    if curves_folder is not None:
+        os.makedirs(curves_folder, exist_ok=True)
+    write_header = not os.path.exists(results_path) or os.path.getsize(results_path) == 0
+    fields = RUN_FIELDS
+    if not write_header:  # keep columns of results written by older version
+        with open(results_path, newline='') as f:
+            fields = next(csv.reader(f))
+    finished = []
+    with open(results_path, 'a', newline='') as f, ProcessPoolExecutor(processes) as executor:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+        if write_header:
+            writer.writeheader()
+        futures = {executor.submit(run_job, job): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                row = future.result()
+            except Exception as e:  # keep other jobs running, failed job will be retried on restart
+                print(f'{job.solver_name} on {job.problem_path} (rerun {job.rerun}) failed: {e!r}')
+                continue
+            writer.writerow(row)
+            f.flush()
+            if profile_path is not None and row['profile'] is not None:
+                with open(profile_path, 'a') as profile_file:
+                    profile_file.write(json.dumps({'problem_name': row['problem_name'], 'solver': row['solver'],
+                                                   'rerun': row['rerun'], **row['profile']},
+                                                  default=_json_default) + '\n')
+            finished.append(row)
+            print(f"{row['problem_name']} {row['solver']} #{row['rerun']}: {row['result']} "
+                  f"(optimal {row['optimal_solution']}) in {row['time']:.2f}s, stopped by {row['stop_reason']}")
+    return finished
+
+
+def aggregate_results(runs_path: str, summary_path: str, solver_names: List[str]):
+    """Writes table with mean result, best result and mean time of each solver per problem.
+    Columns follow `<solver>_result,<solver>_best,<solver>_time` convention used by results_processing.py
+    """
+    table: 'OrderedDict[str, dict]' = OrderedDict()
+    with open(runs_path, newline='') as f:
+        for row in csv.DictReader(f):
+            problem = table.setdefault(row['problem_name'], {
+                'size': int(row['size']), 'optimal_solution': row['optimal_solution'], 'runs': {}})
+            problem['runs'].setdefault(row['solver'], []).append((float(row['result']), float(row['time'])))
+
+    header = ['problem_name', 'size', 'optimal_solution']
+    for solver_name in solver_names:
+        header += [f'{solver_name}_result', f'{solver_name}_best', f'{solver_name}_time']
+
+    with open(summary_path, 'w') as f:
+        f.write(','.join(header) + '\n')
+        for problem_name, problem in sorted(table.items(), key=lambda item: item[1]['size']):
+            line = [problem_name, problem['size'], problem['optimal_solution']]
+            for solver_name in solver_names:
+                runs = problem['runs'].get(solver_name, [])
+                results = [result for result, _ in runs]
+                times = [run_time for _, run_time in runs]
+                line += [np.mean(results), min(results), np.mean(times)] if runs else ['', '', '']
+            f.write(','.join(map(str, line)) + '\n')
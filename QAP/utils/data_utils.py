@@ -1,101 +1,282 @@
 import numpy as np
+import hashlib
+import itertools
+import json
 import os
 import warnings
-from typing import Tuple, List
+from typing import Iterable, Iterator, Optional, Tuple, Union
 
+from QAP.objective import objective
 
-def _parse_matrix(n: int,
-                  rows: List[str]) -> Tuple[np.ndarray, List[str]]:
-    """Parses through rows accounting for different data formats in QAPLib.
+CACHE_DIR_NAME = '.qap_cache'
 
+
+def _to_ints(text: str, file_path: str) -> np.ndarray:
+    with warnings.catch_warnings():
+        # older numpy only warns when text contains something else than integers
+        warnings.simplefilter('error', DeprecationWarning)
+        try:
+            return np.fromstring(text, dtype=np.int64, sep=' ')
+        except (ValueError, DeprecationWarning):
+            raise ValueError(f'{file_path}: data should contain only integer values') from None
+
+
+def _read_tokens(f, chunk_size: int) -> Iterator[np.ndarray]:
+    """Tokenizes text file in chunks of about `chunk_size` characters and yields integer arrays.
+    Layout of rows doesn't matter, so rows wrapped over several lines (common in QAPLib) are handled naturally.
+    """
+    rest = ''
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        chunk = rest + chunk
+        # last token may continue in the next chunk
+        cut = max(chunk.rfind(' '), chunk.rfind('\n'), chunk.rfind('\t'), chunk.rfind('\r'))
+        chunk, rest = chunk[:cut + 1], chunk[cut + 1:]
+        # numpy parses blank text as single zero
+        if chunk and not chunk.isspace():
+            yield _to_ints(chunk, f.name)
+    if rest and not rest.isspace():
+        yield _to_ints(rest, f.name)
+
+
+def _parse_example(file_path: str, chunk_size: int = 2**20) -> Tuple[int, np.ndarray, np.ndarray]:
+    """Streams .dat file straight into preallocated (2, n, n) array,
+    so peak memory stays close to the size of the result even for very large instances.
     Args:
-        n: expected size of matrix
-        rows: rows containing data from both matrices
+        file_path: path to .dat file
+        chunk_size: (optional) number of characters tokenized at once
+    Returns:
+        size of a problem, first and second matrix (in file order)
+    """
+    with open(file_path) as f:
+        tokens = _read_tokens(f, chunk_size)
+        header = next(tokens, np.empty(0, dtype=np.int64))
+        n = int(header[0]) if header.shape[0] else 0
+        expected = 2 * n * n
+        # every value takes at least two characters (digit and separator), so check before allocation
+        if n <= 0 or 2 * expected > os.path.getsize(file_path):
+            raise ValueError(f'{file_path}: malformed size of the problem')
+
+        matrices = np.empty(expected, dtype=np.int64)
+        filled = 0
+        for chunk in itertools.chain([header[1:]], tokens):
+            if filled + chunk.shape[0] > expected:
+                raise ValueError(f'{file_path}: more than {expected} values for problem of size {n}')
+            matrices[filled:filled + chunk.shape[0]] = chunk
+            filled += chunk.shape[0]
 
+    if filled != expected:
+        raise ValueError(f'{file_path}: expected {expected} values for problem of size {n}, got {filled}')
+    matrices = matrices.reshape(2, n, n)
+    return n, matrices[0], matrices[1]
+
+
+def _check_extension(file_path: str, extension: str, check_prefix: bool):
+    assert os.path.exists(file_path), "file does not exists"
+
+    if not file_path.endswith(extension):
+        if check_prefix:
+            raise ValueError(
+                f"File extension should be {extension}. "
+                "Set check_prefix parameter to False if you know what you are doing"
+            )
+        else:
+            warnings.warn(
+                f"be sure to provide right file it usually have {extension} extension")
+
+
+def _cache_path(file_paths: Tuple[str, ...], suffix: str, cache_dir: Optional[str] = None) -> str:
+    """Path of cache entry for given source files, key contains their absolute paths and modification times."""
+    key = hashlib.sha1()
+    for file_path in file_paths:
+        stat = os.stat(file_path)
+        key.update(f'{os.path.abspath(file_path)}:{stat.st_mtime_ns}:{stat.st_size};'.encode())
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(file_paths[0])), CACHE_DIR_NAME)
+    name = os.path.splitext(os.path.basename(file_paths[0]))[0]
+    return os.path.join(cache_dir, f'{name}.{key.hexdigest()[:16]}{suffix}')
+
+
+def _save_atomic(path: str, save_fn):
+    """Writes cache entry to temporary file and renames it, so concurrent readers never see partial file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        save_fn(f)
+    os.replace(tmp_path, path)
+
+
+def smallest_int_dtype(array: np.ndarray) -> np.dtype:
+    """Returns the smallest integer dtype that can hold all values of array."""
+    low, high = (int(array.min()), int(array.max())) if array.size else (0, 0)
+    for dtype in (np.uint8, np.int8, np.uint16, np.int16, np.uint32, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def load_matrices(file_path: str,
+                  check_prefix: bool = True,
+                  cache: bool = True,
+                  cache_dir: Optional[str] = None) -> Tuple[int, np.ndarray, np.ndarray]:
+    """Reads both matrices of .dat file in file order.
+    Parsed matrices are stored in binary cache (.npy with the smallest sufficient integer dtype)
+    keyed by path and modification time, later loads memory-map that file instead of parsing.
+    Args:
+        file_path: path to .dat file from QAPLib or similarly structured file
+        check_prefix: (optional) argument specifies if .dat is required extension.
+        cache: (optional) weather to use binary cache
+        cache_dir: (optional) directory of cache, `.qap_cache` next to the file by default
     Returns:
-        resulting ndarray and rest of rows for next matrix in the file
+        tuple containing size of a problem, first and second matrix (read-only memory maps when cached)
     """
-    result = []
-    row = []
-    row_len = 0
+    _check_extension(file_path, '.dat', check_prefix)
+    if not cache:
+        return _parse_example(file_path)
 
-    for idx, r in enumerate(rows):
-        row_len += len(r.strip().split())
-        row.append(r.strip())
-        if row_len == n:
-            result.append(list(map(int, ('\t'.join(row)).split())))
-            row = []
-            row_len = 0
-            if len(result) == n:
-                return np.array(result), rows[idx+1:]
-        if row_len > n:
-            raise ValueError('something is wrong with data formatting')
+    path = _cache_path((file_path,), '.npy', cache_dir)
+    if not os.path.exists(path):
+        _, first, second = _parse_example(file_path)
+        matrices = np.stack([first, second])
+        matrices = matrices.astype(smallest_int_dtype(matrices))
+        _save_atomic(path, lambda f: np.save(f, matrices))
 
-    return np.array(result), []
+    matrices = np.load(path, mmap_mode='r')
+    return matrices.shape[1], matrices[0], matrices[1]
 
 
 def load_example(file_path: str,
                  check_prefix: bool = True,
-                 dist_first: bool = True) -> Tuple[int, np.ndarray, np.ndarray]:
+                 dist_first: bool = True,
+                 cache: bool = True,
+                 cache_dir: Optional[str] = None,
+                 memory_map: bool = False) -> Tuple[int, np.ndarray, np.ndarray]:
     """Reads specified .dat file from QAPLib and return problem size with D and C matrices for this problem.
     Args:
         file_path: path to .dat file from QAPLib or similarly structured file. See: https://coral.ise.lehigh.edu/data-sets/qaplib/qaplib-problem-instances-and-solutions/#KP # noqa
         check_prefix: (optional) argument specifies if .dat is required extension.
         dist_first: (optional) weather distance matrix goes first in the .dat file
+        cache: (optional) weather to use binary cache (see `load_matrices`)
+        cache_dir: (optional) directory of cache
+        memory_map: (optional) return matrices as they are loaded (read-only memory maps of cache in the smallest
+            sufficient dtype, e.g. for `QAPInstance`) instead of int copies
     Returns:
         tuple containing size of a problem, dists matrix and costs matrix.
     """
-    assert os.path.exists(file_path), "file does not exists"
+    n, first, second = load_matrices(file_path, check_prefix, cache, cache_dir)
+    if not memory_map:
+        first, second = np.array(first, dtype=np.int_), np.array(second, dtype=np.int_)
+
+    if dist_first:  # a bit ugly solution, but they could somehow unify the format, grrrr
+        return n, first, second
+    else:
+        return n, second, first
 
-    if not file_path.endswith('.dat'):
-        if check_prefix:
-            raise ValueError(
-                "File extension should be .dat. "
-                "Set check_prefix parameter to False if you know what you are doing"
-            )
-        else:
-            warnings.warn(
-                "be sure to provide right file it usually have .dat extension")
 
+def _parse_solution(file_path: str) -> Tuple[int, int, np.ndarray]:
     with open(file_path) as f:
         rows = [r for r in f.readlines() if not r.isspace()]
-        n, rows = int(rows[0]), rows[1:]
-        dists, rows = _parse_matrix(n, rows)
-        costs, _ = _parse_matrix(n, rows)
 
-    if dist_first:  # a bit ugly solution, but they could somehow unify the format, grrrr
-        return n, dists, costs
-    else:
-        return n, costs, dists
+        n, opt = map(int, rows[0].split())
+        permutation = np.array(list(map(int, '\t'.join(rows[1:]).split())))
+        permutation -= 1 if permutation.max(
+        ) == n else 0  # to account for 0 indexed arrays
+    return n, opt, permutation
 
 
 def load_solution(file_path: str,
-                  check_prefix: bool = True) -> Tuple[int, int, np.ndarray]:
+                  check_prefix: bool = True,
+                  cache: bool = True,
+                  cache_dir: Optional[str] = None) -> Tuple[int, int, np.ndarray]:
     """Reads specified file from QAPLib and return ndarray for this problem.
         Args:
             file_path: path to .sln file from QAPLib or similarly structured file. See: https://coral.ise.lehigh.edu/data-sets/qaplib/qaplib-problem-instances-and-solutions/#KP # noqa
             check_prefix: (optional) argument specifies if .sln is required extension.
+            cache: (optional) weather to use binary cache
+            cache_dir: (optional) directory of cache
         Returns:
             tuple containing size of a problem, optimal solution and permutation
         """
-    assert os.path.exists(file_path), "file does not exists"
+    _check_extension(file_path, '.sln', check_prefix)
+    if not cache:
+        return _parse_solution(file_path)
 
-    if not file_path.endswith('.sln'):
-        if check_prefix:
-            raise ValueError(
-                "File extension should be .sln. "
-                "Set check_prefix parameter to False if you know what you are doing"
-            )
-        else:
-            warnings.warn(
-                "be sure to provide right file it usually have .sln extension")
+    path = _cache_path((file_path,), '.npy', cache_dir)
+    if not os.path.exists(path):
+        n, opt, permutation = _parse_solution(file_path)
+        _save_atomic(path, lambda f: np.save(f, np.concatenate([[n, opt], permutation]).astype(np.int64)))
 
-    with open(file_path) as f:
-        rows = [r for r in f.readlines() if not r.isspace()]
+    solution = np.load(path)
+    return int(solution[0]), int(solution[1]), solution[2:].astype(np.int_)
 
-        n, opt = map(int, rows[0].split())
-        permutation = np.array(list(map(int, '\t'.join(rows[1:]).split())))
-        permutation -= 1 if permutation.max(
-        ) == n else 0  # to account for 0 indexed arrays
 
-    return n, opt, permutation
+def load_instance(file_path: str,
+                  solution_path: Optional[str] = None,
+                  check_prefix: bool = True,
+                  cache: bool = True,
+                  cache_dir: Optional[str] = None,
+                  memory_map: bool = False) -> Tuple[int, np.ndarray, np.ndarray]:
+    """Reads .dat file and detects which matrix is distance matrix.
+    Order is detected once by comparing objective of known solution with its optimal value
+    and is stored in cache, so matrices never have to be loaded twice.
+    Args:
+        file_path: path to .dat file
+        solution_path: (optional) path to .sln file, without it distance matrix is assumed to go first
+        check_prefix: (optional) argument specifies if .dat and .sln are required extensions.
+        cache: (optional) weather to use binary cache
+        cache_dir: (optional) directory of cache
+        memory_map: (optional) return read-only memory maps of cache instead of int copies (see `load_example`)
+    Returns:
+        tuple containing size of a problem, dists matrix and costs matrix.
+    """
+    if solution_path is None:
+        return load_example(file_path, check_prefix, True, cache, cache_dir, memory_map)
+
+    order_path = _cache_path((file_path, solution_path), '.order.json', cache_dir)
+    if cache and os.path.exists(order_path):
+        with open(order_path) as f:
+            return load_example(file_path, check_prefix, json.load(f)['dist_first'], cache, cache_dir, memory_map)
+
+    n, first, second = load_example(file_path, check_prefix, True, cache, cache_dir, memory_map)
+    _, opt, permutation = load_solution(solution_path, check_prefix, cache, cache_dir)
+    # objective accumulates in dtype of matrices, narrow matrices would overflow
+    wide_first, wide_second = first.astype(np.int64), second.astype(np.int64)
+    if opt == objective(wide_first, wide_second, permutation):
+        dist_first = True
+    elif opt == objective(wide_second, wide_first, permutation):
+        dist_first = False
+    else:
+        raise ValueError(f'{file_path} could not be read: known solution does not match any matrix order')
+
+    if cache:
+        _save_atomic(order_path, lambda f: f.write(json.dumps({'dist_first': dist_first}).encode()))
+    return (n, first, second) if dist_first else (n, second, first)
+
+
+def iter_instances(file_paths: Union[str, Iterable[str]],
+                   solutions_folder: Optional[str] = None,
+                   check_prefix: bool = True,
+                   cache: bool = False,
+                   cache_dir: Optional[str] = None) -> Iterator[Tuple[str, int, np.ndarray, np.ndarray]]:
+    """Lazily reads collection of instances one by one, so only one instance is kept in memory at a time.
+    Args:
+        file_paths: folder with .dat files or iterable of paths to .dat files
+        solutions_folder: (optional) folder with .sln files used to detect order of matrices (see `load_instance`)
+        check_prefix: (optional) argument specifies if .dat and .sln are required extensions.
+        cache: (optional) weather to use binary cache, disabled by default since collections are usually read once
+        cache_dir: (optional) directory of cache
+    Yields:
+        name of instance, size of a problem, dists matrix and costs matrix
+    """
+    if isinstance(file_paths, str):
+        file_paths = sorted(os.path.join(file_paths, name) for name in os.listdir(file_paths)
+                            if name.endswith('.dat'))
+    for file_path in file_paths:
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        solution_path = None
+        if solutions_folder is not None and os.path.exists(os.path.join(solutions_folder, name + '.sln')):
+            solution_path = os.path.join(solutions_folder, name + '.sln')
+        yield (name,) + load_instance(file_path, solution_path, check_prefix, cache, cache_dir)
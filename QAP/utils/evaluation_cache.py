@@ -0,0 +1,63 @@
+from collections import OrderedDict
+from typing import Tuple
+
+import numpy as np
+
+
+class EvaluationCache:
+    """Bounded LRU cache of objective values keyed by 64-bit Zobrist hashes of permutations (see `row_hashes`).
+    Hash is xor of random keys of (position, element) pairs, so equal permutations always share it
+    and collision of two distinct permutations has probability about 2^-64.
+    Args:
+        capacity: maximal number of stored costs, the least recently used are evicted first
+    Attributes:
+        hits: number of costs found in cache
+        misses: number of costs that had to be evaluated
+    """
+    def __init__(self, capacity: int = 10000):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.dtype = None  # dtype of stored costs, known after first store
+        self._costs: 'OrderedDict[int, object]' = OrderedDict()
+
+    def __len__(self):
+        return len(self._costs)
+
+    def lookup(self, hashes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Finds costs of permutations with given hashes.
+        Args:
+            hashes: vector of hashes
+        Returns:
+            vector of costs (zero where missing) and boolean mask of found costs
+        """
+        found = np.zeros(hashes.shape[0], dtype=bool)
+        costs = np.zeros(hashes.shape[0], dtype=self.dtype or np.int64)
+        for k, key in enumerate(hashes.tolist()):
+            cost = self._costs.get(key)
+            if cost is not None:
+                self._costs.move_to_end(key)
+                costs[k] = cost
+                found[k] = True
+        hits = int(np.count_nonzero(found))
+        self.hits += hits
+        self.misses += hashes.shape[0] - hits
+        return costs, found
+
+    def store(self, hashes: np.ndarray, costs: np.ndarray):
+        """Stores evaluated costs and evicts the least recently used ones above capacity."""
+        if self.capacity <= 0:
+            return
+        costs = np.asarray(costs)
+        self.dtype = self.dtype or costs.dtype
+        for key, cost in zip(hashes.tolist(), costs.tolist()):
+            self._costs[key] = cost
+            self._costs.move_to_end(key)
+        while len(self._costs) > self.capacity:
+            self._costs.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Number of hits, misses, hit rate and size of cache."""
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / total if total else 0.0,
+                'size': len(self._costs)}
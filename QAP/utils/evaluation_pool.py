@@ -0,0 +1,323 @@
+import atexit
+import hashlib
+import multiprocessing as mp
+import sys
+import time
+from collections import OrderedDict
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+from QAP.instance import QAPInstance
+from QAP.objective import objective
+
+# (shared memory name, shape, dtype) that is enough for worker to attach to array
+SharedBlock = Tuple[str, Tuple[int, ...], str]
+
+BACKENDS = ('serial', 'thread', 'process')
+# `choose_backend` runs batch serially if it takes less than this, in threads if less than process limit
+AUTO_THREAD_SECONDS = 1e-3
+AUTO_PROCESS_SECONDS = 1e-2
+
+
+class SharedInstance(NamedTuple):
+    """Descriptor of `QAPInstance` whose matrices are in shared memory."""
+    dist: SharedBlock
+    costs: SharedBlock
+    name: Optional[str]
+
+
+_WORKER_CACHE_SIZE = 8
+_worker_arrays: 'OrderedDict[str, Tuple[shared_memory.SharedMemory, np.ndarray]]' = OrderedDict()
+# instances are kept together with their derived data, so it is computed once per worker
+_worker_instances: 'OrderedDict[Tuple[str, str], QAPInstance]' = OrderedDict()
+
+
+def _attach_untracked(name: str) -> shared_memory.SharedMemory:
+    """Attaches to existing shared memory without registering it in resource tracker of worker,
+    otherwise worker would unlink memory owned by parent when it exits."""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def _attach(block: SharedBlock) -> np.ndarray:
+    name, shape, dtype = block
+    if name in _worker_arrays:
+        _worker_arrays.move_to_end(name)
+        return _worker_arrays[name][1]
+
+    shm = _attach_untracked(name)
+    array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    array.flags.writeable = False
+    _worker_arrays[name] = (shm, array)
+    if len(_worker_arrays) > _WORKER_CACHE_SIZE:
+        _, (old_shm, _) = _worker_arrays.popitem(last=False)
+        old_shm.close()
+    return array
+
+
+def _attach_instance(block: SharedInstance) -> QAPInstance:
+    key = (block.dist[0], block.costs[0])
+    if key in _worker_instances:
+        _worker_instances.move_to_end(key)
+        return _worker_instances[key]
+
+    # copies of matrices don't depend on shared memory that can be released when evicted from `_worker_arrays`
+    instance = QAPInstance(np.array(_attach(block.dist)), np.array(_attach(block.costs)), name=block.name)
+    _worker_instances[key] = instance
+    if len(_worker_instances) > _WORKER_CACHE_SIZE:
+        _worker_instances.popitem(last=False)
+    return instance
+
+
+def _call(fn: Callable, blocks: Tuple[Union[SharedBlock, SharedInstance], ...], args: tuple, seed: Optional[int]):
+    # mechanisms use legacy global generator, seeding it per task makes results independent of scheduling
+    if seed is not None:
+        np.random.seed(seed)
+    return fn(*[_attach_instance(block) if isinstance(block, SharedInstance) else _attach(block)
+                for block in blocks], *args)
+
+
+class SerialPool:
+    """Backend with interface of `EvaluationPool` that runs tasks one by one in calling thread.
+    Nothing is copied, so it has no overhead, which is the best choice for small instances.
+    """
+    processes = 1
+
+    def share(self, *arrays: Union[np.ndarray, QAPInstance]) -> Tuple[Union[np.ndarray, QAPInstance], ...]:
+        """Returns arrays and instances themselves, tasks access them directly."""
+        return arrays
+
+    def starmap(self, fn: Callable, blocks: tuple, args: Iterable[tuple], seeded: bool = True) -> List:
+        """Calls `fn(*blocks, *task_args)` for each tuple of task arguments (tasks use generator of caller)."""
+        return [fn(*blocks, *task_args) for task_args in args]
+
+    def close(self):
+        pass
+
+
+class ThreadEvaluationPool(SerialPool):
+    """Backend with interface of `EvaluationPool` that runs tasks in threads of one process.
+    Tasks share instance (and its derived data) without copies, they run in parallel as far as
+    batched NumPy operations release GIL, dispatch costs tens of microseconds instead of a process round trip.
+    Args:
+        processes: number of threads
+    """
+    def __init__(self, processes: int):
+        self.processes = processes
+        self._executor = ThreadPoolExecutor(processes)
+
+    def starmap(self, fn: Callable, blocks: tuple, args: Iterable[tuple], seeded: bool = True) -> List:
+        return list(self._executor.map(lambda task_args: fn(*blocks, *task_args), args))
+
+    def close(self):
+        self._executor.shutdown()
+
+
+class EvaluationPool:
+    """Persistent process pool that keeps problem matrices in shared memory.
+    Matrices are copied to shared memory once by `share`, afterwards tasks carry only block names,
+    so workers exchange just permutation arrays and costs with the parent.
+    Args:
+        processes: number of worker processes
+        seed: (optional) seed of generator of task seeds, by default task seeds are drawn from global numpy
+            generator, so `np.random.seed` in parent makes runs reproducible
+        max_shared: (optional) number of shared matrices kept alive (least recently used are released)
+    """
+    def __init__(self, processes: int, seed: Optional[int] = None, max_shared: int = 8):
+        self.processes = processes
+        self.max_shared = max_shared
+        self._shared: 'OrderedDict[str, Tuple[shared_memory.SharedMemory, SharedBlock]]' = OrderedDict()
+
+        self._seeds = np.random if seed is None else np.random.RandomState(seed)
+        self._pool = mp.get_context().Pool(processes)
+
+    def share(self, *arrays: Union[np.ndarray, QAPInstance]) -> Tuple[Union[SharedBlock, SharedInstance], ...]:
+        """Places arrays in shared memory (arrays with the same content are shared only once).
+        Instance is shared as its matrices in storage dtype, workers rebuild it and keep its derived data.
+        Args:
+            arrays: arrays or instances that workers should access
+        Returns:
+            descriptors of shared blocks that should be passed to `starmap`
+        """
+        blocks = []
+        for array in arrays:
+            if isinstance(array, QAPInstance):
+                blocks.append(SharedInstance(*self.share(array.dist, array.costs), array.name))
+                continue
+            array = np.ascontiguousarray(array)
+            key = hashlib.blake2b(array.tobytes(), digest_size=16).hexdigest() + str(array.dtype) + str(array.shape)
+            if key not in self._shared:
+                shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+                np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+                self._shared[key] = (shm, (shm.name, array.shape, array.dtype.str))
+                if len(self._shared) > self.max_shared:
+                    _, (old_shm, _) = self._shared.popitem(last=False)
+                    old_shm.close()
+                    old_shm.unlink()
+            self._shared.move_to_end(key)
+            blocks.append(self._shared[key][1])
+        return tuple(blocks)
+
+    def starmap(self,
+                fn: Callable,
+                blocks: Tuple[Union[SharedBlock, SharedInstance], ...],
+                args: Iterable[tuple],
+                seeded: bool = True) -> List:
+        """Calls `fn(*shared_arrays, *task_args)` in workers for each tuple of task arguments.
+        Args:
+            fn: module level function (it is pickled by reference)
+            blocks: descriptors returned by `share`
+            args: arguments of each task
+            seeded: (optional) weather tasks use random generator, then each task gets its own seed,
+                deterministic tasks (e.g. evaluations) don't consume random state of caller
+        Returns:
+            list of results in order of tasks
+        """
+        args = list(args)
+        seeds = self._seeds.randint(2 ** 32, size=len(args), dtype=np.int64).tolist() if seeded else [None] * len(args)
+        return self._pool.starmap(_call, [(fn, blocks, task_args, seed) for task_args, seed in zip(args, seeds)])
+
+    def close(self):
+        """Stops workers and releases shared memory."""
+        self._pool.close()
+        self._pool.join()
+        for shm, _ in self._shared.values():
+            shm.close()
+            shm.unlink()
+        self._shared.clear()
+
+
+Pool = Union[SerialPool, ThreadEvaluationPool, EvaluationPool]
+
+_pools: Dict[Tuple[str, int], Pool] = {}
+
+
+def get_evaluation_pool(processes: int, backend: str = 'process') -> Pool:
+    """Returns persistent pool of given backend with given number of processes or threads
+    (created on first use, closed at exit).
+    Args:
+        processes: number of workers
+        backend: (optional) 'serial', 'thread' or 'process'
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f'unknown backend {backend}, available: {list(BACKENDS)}')
+    key = (backend, 1 if backend == 'serial' else processes)
+    if key not in _pools:
+        if backend == 'serial':
+            _pools[key] = SerialPool()
+        elif backend == 'thread':
+            _pools[key] = ThreadEvaluationPool(processes)
+        else:
+            _pools[key] = EvaluationPool(processes)
+    return _pools[key]
+
+
+def choose_backend(instance: QAPInstance,
+                   batch_size: int,
+                   processes: int,
+                   objective_fn: Callable[[np.ndarray, np.ndarray, np.ndarray], int] = objective,
+                   python_loop: bool = False) -> str:
+    """Chooses backend from time of one serial evaluation of `batch_size` random permutations (calibration run):
+    cheap batches run serially, moderate in threads and expensive ones in processes. Threads are chosen only
+    for tasks that are vectorized evaluations of the standard objective, custom objectives (evaluated in Python
+    loop) and tasks with Python loops hold GIL and use global random generator, they never run in threads.
+    Args:
+        instance: solved instance
+        batch_size: number of permutations evaluated by solver between synchronizations (e.g. per iteration)
+        processes: number of available workers
+        objective_fn: (optional) objective of solver
+        python_loop: (optional) weather tasks run Python loop over solutions (e.g. neighbourhood search of bees)
+    Returns:
+        'serial', 'thread' or 'process'
+    """
+    if processes <= 1:
+        return 'serial'
+    evaluation = instance.bind(objective_fn)
+    # own generator, calibration doesn't change random state of solver
+    permutations = np.random.default_rng(0).permuted(np.tile(np.arange(instance.n), (max(1, batch_size), 1)), axis=1)
+    start = time.perf_counter()
+    evaluation.batch_objective(permutations)
+    elapsed = time.perf_counter() - start
+    if elapsed < AUTO_THREAD_SECONDS:
+        return 'serial'
+    # NumPy releases GIL in inner loops of large array operations of standard objective kernels
+    releases_gil = objective_fn is objective and not python_loop
+    if elapsed < AUTO_PROCESS_SECONDS and releases_gil:
+        return 'thread'
+    return 'process'
+
+
+def _evaluate_chunk(instance: QAPInstance, objective_fn: Callable, permutations: np.ndarray) -> np.ndarray:
+    return instance.bind(objective_fn).batch_objective(permutations)
+
+
+def _split_batch_objective(pool: Pool, blocks: tuple, objective_fn: Callable, batch_objective: Callable,
+                           permutations: np.ndarray) -> np.ndarray:
+    if pool.processes <= 1 or permutations.shape[0] < 2 * pool.processes:
+        return batch_objective(permutations)
+    chunks = np.array_split(permutations, pool.processes)
+    return np.concatenate(pool.starmap(_evaluate_chunk, blocks, [(objective_fn, chunk) for chunk in chunks],
+                                       seeded=False))
+
+
+def parallel_batch_objective(pool: Pool,
+                             instance: QAPInstance,
+                             objective_fn: Callable[[np.ndarray, np.ndarray, np.ndarray], int] = objective
+                             ) -> Callable[[np.ndarray], np.ndarray]:
+    """`batch_objective` of instance that splits batches between workers of pool
+    (small batches are evaluated in calling process).
+    Args:
+        pool: pool of any backend
+        instance: solved instance
+        objective_fn: (optional) objective, module level function for process backend
+    Returns:
+        function that evaluates (m, n) array of permutations
+    """
+    return partial(_split_batch_objective, pool, pool.share(instance), objective_fn,
+                   instance.bind(objective_fn).batch_objective)
+
+
+def _reevaluate_chunk(instance: QAPInstance, parents: np.ndarray, parent_costs: np.ndarray,
+                      permutations: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    return instance.reevaluate(parents, parent_costs, permutations)
+
+
+def _split_reevaluate(pool: Pool, blocks: tuple, reevaluate: Callable, parents: np.ndarray,
+                      parent_costs: np.ndarray, permutations: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    if pool.processes <= 1 or permutations.shape[0] < 2 * pool.processes:
+        return reevaluate(parents, parent_costs, permutations)
+    chunks = np.array_split(np.arange(permutations.shape[0]), pool.processes)
+    results = pool.starmap(_reevaluate_chunk, blocks, [
+        (parents[chunk], np.asarray(parent_costs)[chunk], permutations[chunk]) for chunk in chunks], seeded=False)
+    return tuple(np.concatenate(arrays) for arrays in zip(*results))
+
+
+def parallel_reevaluate(pool: Pool, instance: QAPInstance) -> Callable:
+    """`QAPInstance.reevaluate` that splits batches of derived permutations between workers of pool
+    (small batches are evaluated in calling process), only for the standard objective.
+    Args:
+        pool: pool of any backend
+        instance: solved instance
+    Returns:
+        function (parents, parent costs, permutations) -> costs and mask of incrementally evaluated permutations
+    """
+    return partial(_split_reevaluate, pool, pool.share(instance), instance.reevaluate)
+
+
+@atexit.register
+def close_evaluation_pools():
+    """Closes pools created by `get_evaluation_pool`. Runs at interpreter exit and is called explicitly
+    by `run_job` of benchmark runner after each job (its executor workers skip atexit handlers)."""
+    for pool in _pools.values():
+        pool.close()
+    _pools.clear()
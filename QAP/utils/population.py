@@ -0,0 +1,236 @@
+import numpy as np
+from typing import Callable, Optional, Tuple
+from QAP.utils.evaluation_cache import EvaluationCache
+from QAP.utils.solver_utils import row_hashes, swap_hash
+
+
+class Population:
+    """Population of solutions stored in contiguous arrays.
+    Rows [0, len(population)) of `permutations`, `costs`, `ages` and `hashes` are alive,
+    remaining rows up to capacity are free slots reused by `add`. Zobrist hashes of permutations
+    (see `row_hashes`) are kept up to date, in O(1) per swap.
+    Args:
+        n: size of a problem
+        capacity: initial number of preallocated slots (grows automatically if exceeded)
+        batch_objective: function that evaluates (m, n) array of permutations
+        delta: (optional) function (permutation, i, j) -> change of objective after swap
+        row_deltas: (optional) function (permutation, i) -> changes of objective after swaps of i with every position
+        reevaluate: (optional) function (parents, parent costs, permutations) -> costs of permutations and mask
+            of incrementally evaluated ones (see `QAPInstance.reevaluate`)
+        cache: (optional) `EvaluationCache` consulted before every evaluation of permutations
+    Attributes:
+        evaluations: number of full objective evaluations
+        delta_evaluations: number of incremental (swap delta or changed positions) evaluations
+    """
+    def __init__(self,
+                 n: int,
+                 capacity: int,
+                 batch_objective: Callable[[np.ndarray], np.ndarray],
+                 delta: Optional[Callable[[np.ndarray, int, int], int]] = None,
+                 row_deltas: Optional[Callable[[np.ndarray, int], np.ndarray]] = None,
+                 reevaluate: Optional[Callable[[np.ndarray, np.ndarray, np.ndarray],
+                                               Tuple[np.ndarray, np.ndarray]]] = None,
+                 cache: Optional[EvaluationCache] = None):
+        self.n = n
+        self.batch_objective = batch_objective
+        self.delta = delta
+        self.row_deltas = row_deltas
+        self.reevaluate_fn = reevaluate
+        self.cache = cache
+        self.evaluations = 0
+        self.delta_evaluations = 0
+        self.permutations = np.empty((capacity, n), dtype=np.intp)
+        self.costs = None  # allocated on first evaluation to keep dtype of objective
+        self.ages = np.zeros(capacity, dtype=np.int64)
+        self.hashes = np.zeros(capacity, dtype=np.uint64)
+        self.size = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.permutations.shape[0]
+
+    def __len__(self):
+        return self.size
+
+    def _reserve(self, capacity: int, cost_dtype):
+        if self.costs is None:
+            self.costs = np.empty(self.capacity, dtype=cost_dtype)
+        if capacity <= self.capacity:
+            return
+        capacity = max(capacity, 2 * self.capacity)
+        for name in ('permutations', 'costs', 'ages', 'hashes'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def add(self,
+            permutations: np.ndarray,
+            costs: Optional[np.ndarray] = None,
+            parents: Optional[np.ndarray] = None) -> np.ndarray:
+        """Writes solutions to free slots.
+        Args:
+            permutations: (m, n) array of permutations
+            costs: (optional) costs of permutations, evaluated with `batch_objective` if not provided
+            parents: (optional) index of solution each permutation was derived from (-1 for none),
+                permutations close to their parents are evaluated incrementally
+        Returns:
+            indices of added solutions
+        """
+        m = len(permutations)
+        if m == 0:
+            return np.arange(0, dtype=np.intp)
+        hashes = row_hashes(permutations)
+        if costs is None and parents is not None:
+            parents = np.asarray(parents)
+            derived = parents >= 0
+            costs = self._evaluate(permutations, hashes, self.permutations[np.maximum(parents, 0)],
+                                   self.costs[np.maximum(parents, 0)], derived)
+        elif costs is None:
+            costs = self._evaluate(permutations, hashes)
+        costs = np.asarray(costs)
+        self._reserve(self.size + m, costs.dtype)
+
+        idxs = np.arange(self.size, self.size + m)
+        self.permutations[idxs] = permutations
+        self.costs[idxs] = costs
+        self.ages[idxs] = 0
+        self.hashes[idxs] = hashes
+        self.size += m
+        return idxs
+
+    def replace(self, idxs: np.ndarray, permutations: np.ndarray, costs: np.ndarray, ages: np.ndarray = 0):
+        """Overwrites solutions with given indices (e.g. with immigrants or improved sites).
+        Args:
+            idxs: indices of overwritten solutions
+            permutations: new permutations
+            costs: their costs
+            ages: (optional) their ages
+        """
+        self.permutations[idxs] = permutations
+        self.costs[idxs] = costs
+        self.ages[idxs] = ages
+        self.hashes[idxs] = row_hashes(np.reshape(permutations, (-1, self.n)))
+
+    def keep(self, idxs: np.ndarray):
+        """Keeps only solutions with given indices and moves them to first slots (in given order).
+        Args:
+            idxs: indices of surviving solutions
+        """
+        idxs = np.asarray(idxs, dtype=np.intp)
+        k = idxs.shape[0]
+        # fancy indexing creates copy, so overlapping source and destination are safe
+        self.permutations[:k] = self.permutations[idxs]
+        self.costs[:k] = self.costs[idxs]
+        self.ages[:k] = self.ages[idxs]
+        self.hashes[:k] = self.hashes[idxs]
+        self.size = k
+
+    def sort(self):
+        """Sorts alive solutions by cost (ascending)."""
+        self.keep(np.argsort(self.costs[:self.size], kind='stable'))
+
+    def _evaluate(self,
+                  permutations: np.ndarray,
+                  hashes: np.ndarray,
+                  parents: Optional[np.ndarray] = None,
+                  parent_costs: Optional[np.ndarray] = None,
+                  derived: Optional[np.ndarray] = None) -> np.ndarray:
+        """Costs of permutations, found in cache or evaluated (and stored in cache).
+        Permutations derived from parents with known costs are evaluated with `reevaluate`.
+        Args:
+            permutations: (m, n) array of permutations
+            hashes: their hashes
+            parents: (optional) (m, n) array of parents
+            parent_costs: (optional) costs of parents
+            derived: (optional) boolean mask of permutations that have parent, all if parents are given
+        """
+        m = permutations.shape[0]
+        missing = np.arange(m)
+        if self.cache is not None:
+            cached, found = self.cache.lookup(hashes)
+            missing = np.flatnonzero(~found)
+        if parents is None or self.reevaluate_fn is None:
+            derived = np.zeros(m, dtype=bool)
+        elif derived is None:
+            derived = np.ones(m, dtype=bool)
+
+        evaluated = []
+        rows = missing[derived[missing]]
+        if rows.shape[0] > 0:
+            costs, incremental = self.reevaluate_fn(parents[rows], parent_costs[rows], permutations[rows])
+            incremental_count = int(np.count_nonzero(incremental))
+            self.delta_evaluations += incremental_count
+            self.evaluations += rows.shape[0] - incremental_count
+            evaluated.append((rows, costs))
+        rows = missing[~derived[missing]]
+        if rows.shape[0] > 0:
+            evaluated.append((rows, self.batch_objective(permutations[rows])))
+            self.evaluations += rows.shape[0]
+
+        if self.cache is None:
+            costs = np.empty(m, dtype=np.result_type(*[values for _, values in evaluated]))
+        else:
+            costs = cached.astype(np.result_type(cached, *[values for _, values in evaluated]))
+        for rows, values in evaluated:
+            costs[rows] = values
+            if self.cache is not None:
+                self.cache.store(hashes[rows], values)
+        return costs
+
+    def evaluate(self, idxs: np.ndarray):
+        """Recalculates costs (and hashes) of solutions with given indices."""
+        idxs = np.atleast_1d(idxs)
+        self.hashes[idxs] = row_hashes(self.permutations[idxs])
+        self.costs[idxs] = self._evaluate(self.permutations[idxs], self.hashes[idxs])
+
+    def reevaluate(self, idxs: np.ndarray, parents: np.ndarray):
+        """Updates costs of solutions that were changed in place (e.g. by mutation), their costs are still costs
+        of parents. Solutions that differ from parent in few positions are evaluated incrementally.
+        Args:
+            idxs: distinct indices of changed solutions
+            parents: permutations of solutions before change
+        """
+        idxs = np.atleast_1d(idxs)
+        self.hashes[idxs] = row_hashes(self.permutations[idxs])
+        self.costs[idxs] = self._evaluate(self.permutations[idxs], self.hashes[idxs],
+                                          np.reshape(parents, (idxs.shape[0], self.n)), self.costs[idxs])
+
+    def swap(self, idx: int, i: int, j: int, delta: Optional[int] = None):
+        """Swaps genes i and j of solution idx, updates cost in O(n) when `delta` is available.
+        Args:
+            idx: index of solution
+            i: first swapped position
+            j: second swapped position
+            delta: (optional) already known change of cost
+        """
+        permutation = self.permutations[idx]
+        if delta is None and self.delta is None:
+            permutation[[i, j]] = permutation[[j, i]]
+            self.evaluate(idx)
+            return
+        if delta is None:
+            delta = self.delta(permutation, i, j)
+            self.delta_evaluations += 1
+        self.costs[idx] += delta
+        self.hashes[idx] = swap_hash(self.hashes[idx], permutation, i, j)
+        permutation[[i, j]] = permutation[[j, i]]
+
+    def swap_deltas(self, idx: int, i: int) -> np.ndarray:
+        """Changes of cost of solution idx after swapping gene i with every other gene.
+        Uses `row_deltas` when available, otherwise evaluates all swapped permutations.
+        """
+        permutation = self.permutations[idx]
+        if self.row_deltas is not None:
+            self.delta_evaluations += self.n - 1
+            return self.row_deltas(permutation, i)
+
+        neighbours = np.repeat(permutation[None], self.n, axis=0)
+        neighbours[:, i] = permutation
+        neighbours[np.arange(self.n), np.arange(self.n)] = permutation[i]
+        self.evaluations += self.n
+        return self.batch_objective(neighbours) - self.costs[idx]
+
+    def best(self) -> int:
+        """Returns index of solution with the lowest cost."""
+        return int(np.argmin(self.costs[:self.size]))
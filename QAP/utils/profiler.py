@@ -0,0 +1,71 @@
+import time
+from contextlib import contextmanager
+from functools import partial
+from typing import Callable, Dict, List
+
+
+class Profiler:
+    """Accumulates wall time and number of calls of solver phases.
+    Phases can be nested (e.g. objective evaluation inside mutation), `time` of phase includes nested phases
+    and `self_time` excludes them, so self times of all phases sum up to profiled time.
+    Disabled profiler keeps the same interface and does nothing.
+    Args:
+        enabled: (optional) weather to measure anything
+    """
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.phases: Dict[str, List[float]] = {}  # name -> [time, self time, calls]
+        self._nested: List[float] = []  # time of nested phases for each open phase
+        self.start = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Context manager that measures its body as one call of phase `name`."""
+        if not self.enabled:
+            yield
+            return
+        self._nested.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._nested.pop()
+            if self._nested:
+                self._nested[-1] += elapsed
+            stats = self.phases.setdefault(name, [0.0, 0.0, 0])
+            stats[0] += elapsed
+            stats[1] += elapsed - nested
+            stats[2] += 1
+
+    def add(self, name: str, elapsed: float, calls: int = 1):
+        """Records phase measured elsewhere (e.g. in worker process) without affecting nesting."""
+        if not self.enabled:
+            return
+        stats = self.phases.setdefault(name, [0.0, 0.0, 0])
+        stats[0] += elapsed
+        stats[1] += elapsed
+        stats[2] += calls
+
+    def wrap(self, name: str, fn: Callable) -> Callable:
+        """Returns function that measures each call of `fn` as phase `name` (or `fn` itself if disabled)."""
+        if not self.enabled or fn is None:
+            return fn
+        # partial (unlike function) isn't bound as method when assigned to class attribute
+        return partial(self._measured, name, fn)
+
+    def _measured(self, name: str, fn: Callable, *args, **kwargs):
+        with self.phase(name):
+            return fn(*args, **kwargs)
+
+    def report(self, **counters) -> dict:
+        """Structured report: total time, per phase time, self time and calls, and additional counters.
+        Args:
+            counters: (optional) e.g. numbers of full and delta evaluations
+        """
+        return {
+            'total_time': time.perf_counter() - self.start,
+            'phases': {name: {'time': total, 'self_time': self_time, 'calls': calls}
+                       for name, (total, self_time, calls) in self.phases.items()},
+            **counters,
+        }
@@ -1,26 +1,73 @@
 import numpy as np
-from typing import Callable
+from typing import Optional
+from QAP.instance import Evaluation
 
 
 class SolutionRepresentation:
     """Abstract solution representation for problem.
     Args:
-        objective: static function that should be set to objective function of our choice
         permutation: permutation that represents solution
-        cost: cost of the solution represented by permutation
+        calculate_cost: (optional) weather to calculate cost of permutation with `evaluation`
+        evaluation: (optional) evaluation functions of instance (see `QAPInstance.bind`) used to calculate
+            and incrementally update cost, solution without it keeps only permutation and cost
+    Attributes:
+        cost: cost of the solution represented by permutation (-1 if it is not calculated)
     """
-    objective: Callable[[np.ndarray], int] = None
-
-    def __init__(self, permutation, calculate_cost=True):
+    def __init__(self, permutation, calculate_cost=True, evaluation: Optional[Evaluation] = None):
         self.permutation = permutation
-        self.cost = self.objective(permutation) if calculate_cost else -1
+        self.evaluation = evaluation
+        self.cost = evaluation.objective(permutation) if calculate_cost else -1
 
     def calculate_cost(self):
         """Calculates objective function for permutation.
         Returns:
             Chromosome object after setting cost
         """
-        self.cost = self.objective(self.permutation)
+        self.cost = self.evaluation.objective(self.permutation)
+        return self
+
+    def update_cost(self, previous_permutation: np.ndarray):
+        """Updates cost after permutation was changed in place, incrementally when only few positions changed
+        and evaluation supports it.
+        Args:
+            previous_permutation: permutation before change (cost is still cost of it)
+        Returns:
+            object after cost update
+        """
+        if self.evaluation.reevaluate is None or self.cost == -1:
+            return self.calculate_cost()
+        costs, _ = self.evaluation.reevaluate(previous_permutation[None], np.array([self.cost]),
+                                              self.permutation[None])
+        self.cost = costs[0]
+        return self
+
+    @staticmethod
+    def calculate_costs(representations: np.ndarray) -> np.ndarray:
+        """Calculates objective for whole population in one `batch_objective` call.
+        Args:
+            representations: array of representations that share evaluation
+        Returns:
+            the same array after setting costs
+        """
+        if len(representations) == 0:
+            return representations
+        batch_objective = representations[0].evaluation.batch_objective
+        costs = batch_objective(np.stack([r.permutation for r in representations]))
+        for representation, cost in zip(representations, costs):
+            representation.cost = cost
+        return representations
+
+    def swap(self, i: int, j: int):
+        """Swaps genes i and j, updates cost in O(n) when delta of evaluation is available.
+        Returns:
+            object after swap and cost update
+        """
+        if self.evaluation.delta is None or self.cost == -1:
+            self.permutation[[i, j]] = self.permutation[[j, i]]
+            return self.calculate_cost()
+
+        self.cost += self.evaluation.delta(self.permutation, i, j)
+        self.permutation[[i, j]] = self.permutation[[j, i]]
         return self
 
     def __str__(self):
@@ -1,4 +1,18 @@
 import numpy as np
+from functools import lru_cache
+
+
+def random_permutations(n: int, size: int) -> np.ndarray:
+    """Uniformly random permutations generated in one `Generator.permuted` call.
+    Generator is seeded from global numpy state, so `np.random.seed` keeps runs reproducible.
+    Args:
+        n: size of a problem
+        size: number of permutations
+    Returns:
+        (size, n) array of permutations
+    """
+    rng = np.random.default_rng(np.random.randint(2 ** 32, size=4, dtype=np.uint64))
+    return rng.permuted(np.broadcast_to(np.arange(n, dtype=np.intp), (size, n)), axis=1)
 
 
 def generate_random_solutions(n: int, size: int = 100) -> np.ndarray:
@@ -9,20 +23,88 @@ def generate_random_solutions(n: int, size: int = 100) -> np.ndarray:
     Returns:
         ndarray permutations matrix of shape (size, n)
     """
-    return np.stack([np.random.permutation(n) for _ in range(size)], axis=0) if size > 0 else np.array([], dtype=np.object_)
+    return random_permutations(n, size)
 
 
-# TODO: check if naive implementation is faster
 def get_liveness_score(costs: np.ndarray) -> np.ndarray:
     """Get list of chromosome liveness score (probability of surviving and breading).
+    Scores are linear in rank: the worst solution gets 1 / T and the best m / T (T = m(m + 1) / 2), O(m log m).
     Args:
         costs: vector of solution costs
     Returns:
         liveness scores for each solution in current population
     """
     n = costs.shape[0]
-    liveness = np.arange(1, n + 1) / (((1 + n) * n) // 2)
-    idxs = np.argsort(-costs)  # there is no reverse to I should improvise :)
-    P = np.zeros((n, n))
-    P[np.arange(n), idxs] = 1  # create permutation matrix
-    return liveness @ P
+    liveness = np.empty(n)
+    liveness[np.argsort(costs, kind='stable')[::-1]] = np.arange(1, n + 1) / (((1 + n) * n) // 2)
+    return liveness
+
+
+def weighted_sample(weights: np.ndarray, size: int) -> np.ndarray:
+    """Samples indices without replacement with probabilities proportional to weights, O(m).
+    Equivalent to sequential `np.random.choice(m, size, replace=False, p=weights)`, but every index gets key
+    u^(1 / w) (Efraimidis-Spirakis) and `size` largest keys are taken with `argpartition`.
+    Args:
+        weights: vector of non-negative weights
+        size: number of sampled indices (all indices if it exceeds number of weights)
+    Returns:
+        vector of distinct indices
+    """
+    m = weights.shape[0]
+    size = min(size, m)
+    with np.errstate(divide='ignore'):
+        keys = np.log(np.random.random(m)) / weights  # log of key, -inf for zero weights
+    if size == m:
+        return np.argsort(-keys, kind='stable')
+    return np.argpartition(-keys, size - 1)[:size]
+
+
+def stochastic_universal_sampling(weights: np.ndarray, size: int) -> np.ndarray:
+    """Samples indices with `size` equally spaced pointers over cumulative weights (Baker's SUS), O(m + size log m).
+    Every index is selected floor or ceil of its expected number of times `size * w / sum(w)`.
+    Args:
+        weights: vector of non-negative weights
+        size: number of sampled indices
+    Returns:
+        vector of indices (repeated for weights larger than 1 / size of total)
+    """
+    cumulative = np.cumsum(weights)
+    pointers = (np.random.random() + np.arange(size)) * (cumulative[-1] / size)
+    return np.minimum(np.searchsorted(cumulative, pointers, side='right'), weights.shape[0] - 1)
+
+
+@lru_cache(maxsize=None)
+def _hash_table(n: int) -> np.ndarray:
+    """Random 64-bit keys for every (position, gene) pair, fixed for given problem size."""
+    return np.random.default_rng(n).integers(0, 2 ** 63, size=(n, n), dtype=np.uint64)
+
+
+def row_hashes(permutations: np.ndarray) -> np.ndarray:
+    """Zobrist-style 64-bit hashes of permutations.
+    Args:
+        permutations: (m, n) array of permutations
+    Returns:
+        vector of m hashes (equal permutations always have equal hashes)
+    """
+    n = permutations.shape[1]
+    return np.bitwise_xor.reduce(_hash_table(n)[np.arange(n), permutations], axis=1)
+
+
+def permutation_hash(permutation: np.ndarray) -> int:
+    """Zobrist-style 64-bit hash of single permutation (the same as its `row_hashes`)."""
+    return int(row_hashes(permutation[None])[0])
+
+
+def swap_hash(hash_value: np.uint64, permutation: np.ndarray, i: int, j: int) -> np.uint64:
+    """O(1) update of hash of permutation after swapping positions i and j.
+    Args:
+        hash_value: hash of permutation before swap
+        permutation: permutation before swap
+        i: first swapped position
+        j: second swapped position
+    Returns:
+        hash of swapped permutation
+    """
+    table = _hash_table(permutation.shape[0])
+    pi, pj = permutation[i], permutation[j]
+    return np.uint64(hash_value) ^ table[i, pi] ^ table[j, pj] ^ table[i, pj] ^ table[j, pi]
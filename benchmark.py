@@ -1,154 +1,141 @@
-from typing import Tuple
-
+import argparse
 import os
 import numpy as np
-import time
 from QAP.objective import objective
+from QAP.instance import QAPInstance
 from QAP.solvers.bees import bees_solver
 from QAP.solvers.genetic import genetic_solver
+from QAP.solvers.tabu import tabu_solver
+from QAP.solvers.annealing import annealing_solver
+from QAP.solvers.exact import exact_solver
+from QAP.solvers.stopping_criteria import StoppingCriteria
 from QAP.solvers.mutation_mechanisms import SwapMutation, ShiftMutation, UniformMutationScheduler
-from QAP.utils import load_solution, load_example
-
-
-def test_genetic(size: int, dists: np.ndarray, costs: np.ndarray, reruns_number: int = 3) -> Tuple[float, float, int]:
-    mutation_mutations = (SwapMutation(mutation_prob=0.3), ShiftMutation())
-    results = []
-    times = []
-    for i in range(reruns_number):
-        print("Genetic algorithm run: " + str(i + 1))
-        start = time.time()
-        res = genetic_solver(
-            size,
-            dists,
-            costs,
-            objective,
-            max_iterations=1000,
-            population_size=100,
-            verbose=True,
-            print_every=100,
-            selection_size=100,
-            crossover_count=50,
-            mutation_mechanism=UniformMutationScheduler,
-            # mutation_prob=0.1,
-            mutation_mutations=mutation_mutations,
-        )
-        end = time.time()
-        results.append(res.cost)
-        times.append(end - start)
-
-    return sum(results) / len(results), sum(times) / len(times), min(results)
-
-
-def test_bees(size: int, dists: np.ndarray, costs: np.ndarray, reruns_number: int = 3) -> Tuple[float, float, int]:
-    mutation_mutations = (SwapMutation(mutation_prob=1), ShiftMutation())
-    results = []
-    times = []
-
-    for i in range(reruns_number):
-        print("Bee's algorithm run: " + str(i + 1))
-        start = time.time()
-        res = bees_solver(
-            size,
-            dists,
-            costs,
-            objective,
-            max_iterations=1000,
-            population_size=100,
-            verbose=True,
-            print_every=100,
-            elite_population=5,
-            selected_population=50,
-            elite_search_size=10,
-            selected_search_size=7,
-            solution_lifetime=20,
-            bad_epoch_patience=40,
-            thread_pool_size=12,
-            mutation_mechanism=UniformMutationScheduler,
-            mutation_mutations=mutation_mutations,
-        )
-        end = time.time()
-        results.append(res.cost)
-        times.append(end - start)
-
-    return sum(results) / len(results), sum(times) / len(times), min(results)
-
-
-def test_random(size: int, dists: np.ndarray, costs: np.ndarray, reruns_number: int = 3) -> Tuple[float, float, int]:
-    results = []
-    times = []
-    for i in range(reruns_number):
-        print("Random algorithm run: " + str(i + 1))
-        random_results = []
-        s = time.time()
-        for _ in range(100000):
-            random_results.append(objective(dists, costs, np.random.permutation(size)))
-        e = time.time()
-        times.append(e - s)
-
-        results.append(min(random_results))
-
-    return sum(results) / len(results), sum(times) / len(times), min(results)
+from QAP.utils.solution_representation import SolutionRepresentation
+from QAP.utils.solver_utils import generate_random_solutions
+from QAP.utils.benchmark_runner import run_benchmark, aggregate_results
+
+
+def random_solver(instance: QAPInstance,
+                  samples_number: int = 100000, batch_size: int = 10000, **kwargs) -> SolutionRepresentation:
+    """Best of `samples_number` random permutations (batches are iterations of `StoppingCriteria`)."""
+    stopping = StoppingCriteria(**{key: value for key, value in kwargs.items() if key.startswith('stopping_')})
+    best = SolutionRepresentation(None, calculate_cost=False)
+    best.cost = np.inf
+    best.stop_reason = StoppingCriteria.MAX_ITERATIONS
+    for start in range(0, samples_number, batch_size):
+        permutations = generate_random_solutions(instance.n, size=min(batch_size, samples_number - start))
+        results = instance.batch_objective(permutations)
+        idx = np.argmin(results)
+        if results[idx] < best.cost:
+            best.permutation, best.cost = permutations[idx], results[idx]
+        stop_reason = stopping(best.cost, start + len(permutations))
+        if stop_reason is not None:
+            best.stop_reason = stop_reason
+            break
+    return best
+
+
+SOLVERS = {
+    'bees': dict(
+        solver=bees_solver,
+        objective=objective,
+        max_iterations=1000,
+        population_size=100,
+        verbose=False,
+        elite_population=5,
+        selected_population=50,
+        elite_search_size=10,
+        selected_search_size=7,
+        solution_lifetime=20,  # sites are abandoned, results.csv was produced when lifetime was ignored
+        bad_epoch_patience=40,
+        thread_pool_size=1,
+        mutation_mechanism=UniformMutationScheduler,
+        mutation_mutations=(SwapMutation(mutation_prob=1), ShiftMutation()),
+    ),
+    'genetic': dict(
+        solver=genetic_solver,
+        objective=objective,
+        max_iterations=1000,
+        population_size=100,
+        verbose=False,
+        selection_size=100,
+        crossover_count=50,
+        mutation_mechanism=UniformMutationScheduler,
+        mutation_mutations=(SwapMutation(mutation_prob=0.3), ShiftMutation()),
+    ),
+    'tabu': dict(
+        solver=tabu_solver,
+        objective=objective,
+        max_iterations=10000,
+        verbose=False,
+    ),
+    'annealing': dict(
+        solver=annealing_solver,
+        objective=objective,
+        max_iterations=50000,
+        chains=8,
+        verbose=False,
+    ),
+    # branch and bound is exponential, it is run only when requested with --solvers (on small problems)
+    'exact': dict(
+        solver=exact_solver,
+        objective=objective,
+        max_nodes=10000,
+        verbose=False,
+        stopping_target=None,  # keep searching after reaching optimum to prove it
+    ),
+    'random': dict(
+        solver=random_solver,
+        samples_number=100000,
+    ),
+}
+
+PROBLEMS = [
+    'lipa20b',
+    'lipa30b',
+    'lipa40b',
+    'lipa50b',
+    'lipa60b',
+    'lipa70b',
+    'lipa80b',
+    'lipa90b',
+]
 
 
 if __name__ == "__main__":
-    data_folder = 'results/'
-    problems_folder = data_folder + 'qapdata/'
-    solutions_folder = data_folder + 'qapsoln/'
-    results_file = 'results.csv'
-    reruns_number = 3
-
-    problems = [
-        'lipa20b.dat',
-        'lipa30b.dat',
-        'lipa40b.dat',
-        'lipa50b.dat',
-        'lipa60b.dat',
-        'lipa70b.dat',
-        'lipa80b.dat',
-        'lipa90b.dat',
-    ]
-
-    solutions = [
-        'lipa20b.sln',
-        'lipa30b.sln',
-        'lipa40b.sln',
-        'lipa50b.sln',
-        'lipa60b.sln',
-        'lipa70b.sln',
-        'lipa80b.sln',
-        'lipa90b.sln',
-    ]
-
-    results = []
-
-    for problem, solution in zip(problems, solutions):
-        size, dists, costs = load_example(os.path.join(problems_folder, problem), dist_first=True)
-        _, opt, permutation = load_solution(os.path.join(solutions_folder, solution))
-
-        if not opt == objective(dists, costs, permutation):
-            size, dists, costs = load_example(os.path.join(problems_folder, problem), dist_first=False)
-            _, opt, permutation = load_solution(os.path.join(solutions_folder, solution))
-
-        if not opt == objective(dists, costs, permutation):
-            print(problem + " could not be read!")
-            continue
-
-        print("Processing problem: " + problem)
-
-        bees_result, bees_time, bees_best = test_bees(size, dists, costs, reruns_number)
-        genetic_result, genetic_time, genetic_best = test_genetic(size, dists, costs, reruns_number)
-        random_result, random_time, random_best = test_random(size, dists, costs, reruns_number)
-
-        results.append((problem, size, opt,
-                        bees_result, bees_best, bees_time,
-                        genetic_result, genetic_best, genetic_time,
-                        random_result, random_best, random_time))
-
-    if not os.path.exists(data_folder):
-        os.makedirs(data_folder)
-
-    with open(os.path.join(data_folder, results_file), 'w') as file:
-        file.write("problem_name,size,optimal_solution,bees_result,bees_best,bees_time,genetic_result,genetic_best,genetic_time,random_result,random_best,random_time\n")
-        for line in results:
-            file.write(",".join(map(lambda x: str(x), line)) + '\n')
-
+    parser = argparse.ArgumentParser(description='Benchmark QAP solvers on QAPLib problems.')
+    parser.add_argument('--processes', type=int, default=os.cpu_count(), help='number of parallel jobs')
+    parser.add_argument('--reruns', type=int, default=3, help='number of runs of each solver on each problem')
+    parser.add_argument('--seed', type=int, default=0, help='base seed of all jobs')
+    parser.add_argument('--solvers', nargs='+', default=[name for name in SOLVERS if name != 'exact'],
+                        choices=list(SOLVERS), help='solvers to run, exact solver is opt-in')
+    parser.add_argument('--problems', nargs='+', default=PROBLEMS)
+    parser.add_argument('--results-folder', default='results/')
+    parser.add_argument('--time-limit', type=float, default=None, help='wall-clock budget of every run in seconds')
+    parser.add_argument('--no-stop-at-optimum', dest='stop_at_optimum', action='store_false',
+                        help='keep solvers running after they reach known optimal solution')
+    parser.add_argument('--curves', action='store_true',
+                        help='write convergence curve of every run to <results-folder>/curves/ as JSON lines')
+    parser.add_argument('--bound-gap', type=float, default=None,
+                        help='stop runs when gap to Gilmore-Lawler lower bound (in percents) falls to this value')
+    parser.add_argument('--profile', action='store_true',
+                        help='write per-phase timings of every run to <results-folder>/profile.jsonl')
+    args = parser.parse_args()
+
+    problems_folder = 'data/qapdata/'
+    solutions_folder = 'data/qapsoln/'
+    runs_file = os.path.join(args.results_folder, 'runs.csv')
+    # results.csv, results_v2.csv and results_random.csv are kept as published
+    results_file = os.path.join(args.results_folder, 'summary.csv')
+
+    problems = [(os.path.join(problems_folder, problem + '.dat'), os.path.join(solutions_folder, problem + '.sln'))
+                for problem in args.problems]
+    solvers = {name: SOLVERS[name] for name in args.solvers}
+
+    run_benchmark(problems, solvers, runs_file,
+                  reruns_number=args.reruns, processes=args.processes, base_seed=args.seed,
+                  stop_at_optimum=args.stop_at_optimum, time_limit=args.time_limit,
+                  curves_folder=os.path.join(args.results_folder, 'curves') if args.curves else None,
+                  profile_path=os.path.join(args.results_folder, 'profile.jsonl') if args.profile else None,
+                  bound_gap=args.bound_gap)
+    aggregate_results(runs_file, results_file, list(solvers))
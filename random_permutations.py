@@ -1,5 +1,6 @@
 from QAP.utils import load_solution, load_example
-from QAP.objective import objective, naive_objective
+from QAP.objective import objective, naive_objective, batch_objective
+from QAP.utils.solver_utils import generate_random_solutions
 import numpy as np
 
 if __name__ == '__main__':
@@ -11,9 +12,7 @@ if __name__ == '__main__':
                                   permutation), "something wrong with objective"
 
     np.random.seed(1234)
-    diffs = []
-    for _ in range(10000):
-        diffs.append(objective(dists, costs, np.random.permutation(n)) - opt)
+    diffs = batch_objective(dists, costs, generate_random_solutions(n, size=10000)) - opt
 
     print(
         f'mean difference for random permutations is {np.mean(diffs)}, min {np.min(diffs)}, max {np.max(diffs)}\n'
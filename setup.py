@@ -3,6 +3,6 @@ from setuptools import setup, find_packages
 setup(
     name='QAP',
     version='0.1.0',
-    install_requires=['numpy', 'tqdm', 'pandas', 'matplotlib'],
+    install_requires=['numpy', 'pandas', 'matplotlib'],
     packages=find_packages(),
 )